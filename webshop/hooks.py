@@ -42,12 +42,19 @@ doc_events = {
         "on_update": [
             "webshop.webshop.crud_events.item.update_website_item.execute",
             "webshop.webshop.crud_events.item.invalidate_item_variants_cache.execute",
+            "webshop.webshop.pos_api.clear_pos_items_cache",
+            "webshop.webshop.pos_api.clear_attribute_name_mapping_cache",
+        ],
+        "on_trash": [
+            "webshop.webshop.pos_api.clear_pos_items_cache",
+            "webshop.webshop.pos_api.clear_attribute_name_mapping_cache",
         ],
         "before_rename": [
             "webshop.webshop.crud_events.item.validate_duplicate_website_item.execute",
         ],
         "after_rename": [
             "webshop.webshop.crud_events.item.invalidate_item_variants_cache.execute",
+            "webshop.webshop.pos_api.invalidate_price_cache",
         ],
     },
     "Sales Taxes and Charges Template": {
@@ -64,12 +71,69 @@ doc_events = {
         "validate": [
             "webshop.webshop.crud_events.price_list.check_impact_on_cart.execute"
         ],
+        "on_update": [
+            "webshop.webshop.pos_api.invalidate_price_cache",
+            "webshop.webshop.pos_api.clear_pos_reference_cache",
+        ],
+        "on_trash": [
+            "webshop.webshop.pos_api.invalidate_price_cache",
+            "webshop.webshop.pos_api.clear_pos_reference_cache",
+        ],
+        "after_rename": [
+            "webshop.webshop.pos_api.invalidate_price_cache",
+            "webshop.webshop.pos_api.clear_pos_reference_cache",
+        ],
+    },
+    "Customer": {
+        "on_update": [
+            "webshop.webshop.pos_api.clear_pos_customers_cache",
+        ],
+        "on_trash": [
+            "webshop.webshop.pos_api.clear_pos_customers_cache",
+        ],
+    },
+    "Item Group": {
+        "on_update": [
+            "webshop.webshop.pos_api.clear_pos_reference_cache",
+        ],
+        "on_trash": [
+            "webshop.webshop.pos_api.clear_pos_reference_cache",
+        ],
+    },
+    "Item Price": {
+        "on_update": [
+            "webshop.webshop.pos_api.invalidate_price_cache",
+        ],
+        "on_trash": [
+            "webshop.webshop.pos_api.invalidate_price_cache",
+        ],
+    },
+    "Stock Settings": {
+        "on_update": [
+            "webshop.webshop.pos_api.clear_default_warehouse_cache",
+        ],
+    },
+    "Website Item": {
+        "on_update": [
+            "webshop.webshop.pos_api.clear_pos_items_cache",
+        ],
+        "on_trash": [
+            "webshop.webshop.pos_api.clear_pos_items_cache",
+        ],
     },
     "Tax Rule": {
         "validate": [
             "webshop.webshop.crud_events.tax_rule.validate_use_for_cart.execute",
         ],
     },
+    "Item Attribute": {
+        "on_update": [
+            "webshop.webshop.pos_api.clear_attribute_name_mapping_cache",
+        ],
+        "on_trash": [
+            "webshop.webshop.pos_api.clear_attribute_name_mapping_cache",
+        ],
+    },
 }
 
 has_website_permission = {
@@ -0,0 +1,20 @@
+import frappe
+
+
+def execute():
+	"""Stored flag for a non-empty `custom_material_type` so material checks are a single indexed predicate."""
+	# custom_material_type is added through Customize Form and may not exist yet
+	if not frappe.db.has_column("Item", "custom_material_type"):
+		return
+
+	if not frappe.db.has_column("Item", "has_material"):
+		frappe.db.sql_ddl(
+			"""
+			ALTER TABLE `tabItem`
+			ADD COLUMN `has_material` TINYINT(1)
+				GENERATED ALWAYS AS (custom_material_type IS NOT NULL AND custom_material_type <> '') STORED
+			"""
+		)
+		frappe.clear_cache(doctype="Item")
+
+	frappe.db.add_index("Item", ["has_material", "disabled"], "pos_has_material_index")
@@ -0,0 +1,20 @@
+import frappe
+
+
+def execute():
+	"""Stored flag for `has_variants = 0 OR variant_of IS NOT NULL` so POS queries can use an index."""
+	if not frappe.db.has_column("Item", "is_sellable"):
+		frappe.db.sql_ddl(
+			"""
+			ALTER TABLE `tabItem`
+			ADD COLUMN `is_sellable` TINYINT(1)
+				GENERATED ALWAYS AS ((has_variants = 0) OR (variant_of IS NOT NULL)) STORED
+			"""
+		)
+		frappe.clear_cache(doctype="Item")
+
+	fields = ["disabled", "is_sales_item", "is_sellable"]
+	if frappe.db.has_column("Item", "custom_material_type"):
+		fields.append("custom_material_type")
+
+	frappe.db.add_index("Item", fields, "pos_sellable_index")
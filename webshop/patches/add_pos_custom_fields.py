@@ -0,0 +1,5 @@
+from webshop.setup.install import add_pos_custom_fields
+
+
+def execute():
+	add_pos_custom_fields()
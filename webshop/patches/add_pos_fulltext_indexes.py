@@ -0,0 +1,32 @@
+import frappe
+
+# FULLTEXT indexes backing the POS contains-style searches in webshop.webshop.pos_api
+# doctype -> [(index_name, fields)]
+POS_FULLTEXT_INDEXES = {
+	"Customer": [
+		("ft_customer_search", ["name", "customer_name", "mobile_no", "email_id"]),
+	],
+	"Item": [
+		("ft_item", ["name", "item_name"]),
+	],
+}
+
+# Indexes replaced by the ones above (ft_customer did not cover the customer ID)
+OBSOLETE_FULLTEXT_INDEXES = {
+	"Customer": ["ft_customer"],
+}
+
+
+def execute():
+	for doctype, index_names in OBSOLETE_FULLTEXT_INDEXES.items():
+		for index_name in index_names:
+			if frappe.db.sql(f"SHOW INDEX FROM `tab{doctype}` WHERE Key_name = %s", index_name):
+				frappe.db.sql_ddl(f"ALTER TABLE `tab{doctype}` DROP INDEX `{index_name}`")
+
+	for doctype, indexes in POS_FULLTEXT_INDEXES.items():
+		for index_name, fields in indexes:
+			if frappe.db.sql(f"SHOW INDEX FROM `tab{doctype}` WHERE Key_name = %s", index_name):
+				continue
+
+			columns = ", ".join(f"`{field}`" for field in fields)
+			frappe.db.sql_ddl(f"ALTER TABLE `tab{doctype}` ADD FULLTEXT `{index_name}` ({columns})")
@@ -0,0 +1,61 @@
+import frappe
+
+# Composite indexes backing the POS item queries in webshop.webshop.pos_api
+# doctype -> [(index_name, fields)]
+POS_INDEXES = {
+	"Item": [
+		(
+			"pos_item_filter_index",
+			["disabled", "is_sales_item", "custom_material_type", "custom_style", "custom_material_class"],
+		),
+		# sellable-item scans in setup_fence_item_attributes / get_dynamic_fence_attributes
+		("pos_item_variant_index", ["disabled", "has_variants", "is_sales_item"]),
+		# loose index scan for the distinct material types list
+		("pos_material_type_index", ["disabled", "custom_material_type"]),
+		# index-only GROUP BY for the custom_style / custom_material_class analysis endpoints
+		("pos_style_index", ["disabled", "custom_style"]),
+		("pos_material_class_index", ["disabled", "custom_material_class"]),
+		# popular items panel
+		("pos_popular_index", ["custom_popular", "disabled", "is_sales_item"]),
+		# first page of sellable items by name (get_template_items_for_pos)
+		("pos_sales_item_name_index", ["disabled", "is_sales_item", "item_name"]),
+	],
+	"Item Variant Attribute": [
+		# attribute filters (Fence Height, Color, Rail Type) probe by (attribute, value) -> parent
+		("pos_attribute_value_index", ["attribute", "attribute_value", "parent"]),
+		("pos_parent_attribute_index", ["parent", "attribute"]),
+	],
+	"Website Item": [
+		("pos_published_item_index", ["published", "item_code"]),
+	],
+	"Product Bundle": [
+		("pos_new_item_code_index", ["new_item_code"]),
+	],
+	"Product Bundle Item": [
+		("pos_parent_idx_index", ["parent", "idx"]),
+	],
+	"Item Price": [
+		# batched POS price lookups, answered from the index alone
+		("pos_price_lookup_index", ["price_list", "item_code", "price_list_rate"]),
+	],
+	"Bin": [
+		# batched POS stock lookups for the default warehouse
+		("pos_bin_lookup_index", ["warehouse", "item_code", "actual_qty"]),
+	],
+	"Customer": [
+		("pos_customer_name_index", ["disabled", "customer_name"]),
+		# recently modified customers, shown when the POS customer search is empty
+		("pos_customer_modified_index", ["modified"]),
+	],
+}
+
+
+def execute():
+	for doctype, indexes in POS_INDEXES.items():
+		for index_name, fields in indexes:
+			# custom_* columns only exist once they are added via Customize Form
+			if all(frappe.db.has_column(doctype, field) for field in fields):
+				frappe.db.add_index(doctype, fields, index_name)
+
+		# refresh optimizer statistics so the new indexes are picked up straight away
+		frappe.db.sql(f"ANALYZE TABLE `tab{doctype}`")
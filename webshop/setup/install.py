@@ -12,6 +12,7 @@ def after_install():
 	drop_ecommerce_settings()
 	remove_ecommerce_settings_doctype()
 	add_custom_fields()
+	add_pos_custom_fields()
 	navbar_add_products_link()
 	say_thanks()
 
@@ -201,6 +202,60 @@ def add_custom_fields():
 
 	return create_custom_fields(custom_fields)
 
+
+def get_pos_custom_fields():
+	# Order fields shared by Quotation and Sales Order, so POS details survive conversion.
+	# Not named order_type: both doctypes already have that standard field (the cart sets it)
+	order_fields = [
+		{
+			"fieldname": "pos_order_type",
+			"fieldtype": "Select",
+			"options": "Quote\nOrder",
+			"label": "POS Order Type",
+			"insert_after": "customer",
+		},
+		{
+			"fieldname": "delivery_method",
+			"fieldtype": "Select",
+			"options": "Pickup\nDelivery",
+			"label": "Delivery Method",
+			"insert_after": "pos_order_type",
+		},
+		{
+			"fieldname": "scheduled_date",
+			"fieldtype": "Date",
+			"label": "Scheduled Date",
+			"insert_after": "delivery_method",
+		},
+		{
+			"fieldname": "scheduled_time",
+			"fieldtype": "Time",
+			"label": "Scheduled Time",
+			"insert_after": "scheduled_date",
+		},
+	]
+
+	return {
+		"Item": [
+			{
+				"fieldname": "custom_popular",
+				"fieldtype": "Check",
+				"label": "Popular Item",
+				"description": "Mark this item as popular for POS display",
+				"default": "0",
+				"insert_after": "published_in_website",
+			},
+		],
+		"Quotation": order_fields,
+		"Sales Order": order_fields,
+	}
+
+
+def add_pos_custom_fields():
+	# existing fields are left as they are; they may have been adjusted via Customize Form
+	create_custom_fields(get_pos_custom_fields(), update=False)
+
+
 def navbar_add_products_link():
 	website_settings = frappe.get_doc("Website Settings")
 	if website_settings.top_bar_items:
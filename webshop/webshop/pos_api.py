@@ -1,50 +1,116 @@
 """
 Fence POS API - Extends webshop functionality for POS system
 Integrates with existing webshop infrastructure
+
+The queries here rely on the composite indexes in webshop/patches/add_pos_indexes.py;
+keep that list in step when changing their filters
 """
 
+import base64
+import functools
+import hashlib
+import json
+import logging
+import re
+from collections import defaultdict, namedtuple
+
 import frappe
 from frappe import _
+from frappe.utils import cint
 from webshop.webshop.shopping_cart import cart
 from webshop.webshop.shopping_cart.cart import get_party
 from webshop.webshop.api import get_product_filter_data
+from webshop.setup.install import add_pos_custom_fields
+
+# Module logger; debug output is off in production, so pass values as lazy %s arguments.
+# Not a per-site logger: this runs at import time, before any request has picked a site
+logger = frappe.logger("pos_api")
+
+
+_LIKE_ESCAPE = str.maketrans({"\\": "\\\\", "%": r"\%", "_": r"\_"})
+
+def escape_like(search_term):
+    """Escape LIKE wildcards so user input only ever matches literally"""
+    return search_term.translate(_LIKE_ESCAPE)
+
+
+def get_request_cached(key, generator):
+    """
+    Memoize a lookup for the rest of the current request.
+    Repeat calls within one request are answered from frappe.local instead of redis or the database.
+    """
+    if not hasattr(frappe.local, "pos_request_cache"):
+        frappe.local.pos_request_cache = {}
+    
+    cache = frappe.local.pos_request_cache
+    if key not in cache:
+        cache[key] = generator()
+    return cache[key]
+
 
 def get_attribute_name_mapping():
     """
     MAINTENANCE FREE: Get current attribute name mapping dynamically.
+    Cached in redis for an hour - cleared by clear_attribute_name_mapping_cache on Item Attribute changes.
+    """
+    return get_request_cached("attr_mapping", get_cached_attribute_name_mapping)
+
+
+def get_cached_attribute_name_mapping():
+    # Variant attributes are saved with their Item, so the expiry picks up
+    # attributes newly put to use even when no Item Attribute changed
+    mapping = frappe.cache().get_value("pos_attr_mapping")
+    if mapping is None:
+        mapping = build_attribute_name_mapping()
+        frappe.cache().set_value("pos_attr_mapping", mapping, expires_in_sec=3600)
+    return mapping
+
+
+def clear_attribute_name_mapping_cache(doc=None, method=None):
+    """doc_events hook: drop the cached attribute name mapping"""
+    frappe.cache().delete_value("pos_attr_mapping")
+
+
+def clear_pos_caches(doc=None, method=None):
+    """Drop every cached POS lookup (attribute mapping, reference data, item rows, analysis), e.g. after a bulk import"""
+    clear_attribute_name_mapping_cache()
+    clear_pos_reference_cache()
+    clear_pos_items_cache()
+    clear_pos_analysis_cache()
+
+
+def clear_pos_reference_cache(doc=None, method=None, *args):
+    """doc_events hook: drop the cached POS price lists and fence categories"""
+    frappe.cache().hdel("pos_api", "price_lists")
+    frappe.cache().hdel("pos_api", "fence_categories")
+
+
+def build_attribute_name_mapping():
+    """
     Returns the actual attribute names being used in the system.
     """
     try:
-        # Get all distinct attribute names from the system
+        # Classify attribute names in SQL, one row per kind
         attributes = frappe.db.sql("""
-            SELECT DISTINCT attribute
-            FROM `tabItem Variant Attribute` iva
-            INNER JOIN `tabItem` i ON iva.parent = i.name
-            WHERE i.disabled = 0 AND i.has_variants = 0
+            SELECT kind, MIN(attribute) AS attribute
+            FROM (
+                SELECT DISTINCT
+                    iva.attribute,
+                    CASE
+                        WHEN LOWER(iva.attribute) LIKE '%%height%%' THEN 'height'
+                        WHEN LOWER(iva.attribute) LIKE '%%color%%' THEN 'color'
+                        WHEN LOWER(iva.attribute) LIKE '%%style%%'
+                            OR LOWER(iva.attribute) LIKE '%%type%%' THEN 'style'
+                    END AS kind
+                FROM `tabItem Variant Attribute` iva
+                INNER JOIN `tabItem` i ON iva.parent = i.name
+                WHERE i.disabled = 0 AND i.has_variants = 0
+            ) classified
+            WHERE kind IS NOT NULL
+            GROUP BY kind
         """, as_dict=True)
         
-        # Map common attribute patterns to actual attribute names
-        mapping = {}
-        
-        height_keywords = ['height', 'fence height', 'post height']
-        color_keywords = ['color', 'fence color']
-        style_keywords = ['style', 'fence style', 'type']
-        
-        for attr in attributes:
-            attr_name = attr.attribute
-            attr_lower = attr_name.lower()
-            
-            # Find height attribute
-            if 'height' not in mapping and any(keyword in attr_lower for keyword in height_keywords):
-                mapping['height'] = attr_name
-            
-            # Find color attribute  
-            if 'color' not in mapping and any(keyword in attr_lower for keyword in color_keywords):
-                mapping['color'] = attr_name
-                
-            # Find style attribute
-            if 'style' not in mapping and any(keyword in attr_lower for keyword in style_keywords):
-                mapping['style'] = attr_name
+        mapping = {attr.kind: attr.attribute for attr in attributes}
         
         return mapping
         
@@ -54,207 +120,395 @@ def get_attribute_name_mapping():
 
 
 
-@frappe.whitelist()
-def get_fence_items_for_pos(category=None, height=None, color=None, style=None, railType=None, price_list=None):
-    print(f"🔥 POS API CALLED WITH PRICE LIST: {price_list}")
-    """Get fence items for POS using SIMPLE filtering: custom_material_type -> custom_style -> sort by custom_material_class"""
+def get_pos_item_rows(category=None, height=None, color=None, style=None, railType=None, cursor=None, page_size=100, include_web_fields=1):
+    """Cached rows of one POS item page; prices and stock are looked up live by the caller"""
+    filters = (category, height, color, style, railType, cursor, page_size, include_web_fields)
+    # Hash the filters so long cursors and free-text values still give a short, fixed-size key.
+    # Keys carry the current generation, so clearing the cache never has to scan for them
+    key = f"pos_items:{get_cache_generation('pos_items')}:" + hashlib.md5(repr(filters).encode()).hexdigest()
     
-    try:
-        # Start with base item filtering (only sellable variants, not templates)
-        where_conditions = [
-            "i.disabled = 0", 
-            "i.is_sales_item = 1",
-            "(i.has_variants = 0 OR i.variant_of IS NOT NULL)"
-        ]
-        
-        # Include Hardware and Cap items in the main query
-        # These should be filtered by material type and color, but not by style/height/rail type
-        include_hardware_caps = True
-        query_params = []
-        
-        # PRIMARY FILTER: custom_material_type
-        if category:
-            # For Cap and Hardware items, also check custom_type_of_material field
-            where_conditions.append("""
-                (i.custom_material_type = %s 
-                OR (i.custom_material_class IN ('Cap', 'Hardware') 
-                    AND i.name IN (
-                        SELECT parent 
-                        FROM `tabCustom Type Of Material` 
-                        WHERE material_type = %s
-                    )
-                ))
-            """)
-            query_params.append(category)
-            query_params.append(category)
-            frappe.logger().info(f"POS API Debug - Primary filter (custom_material_type): '{category}' (including custom_type_of_material for Cap/Hardware)")
-        
-        # SECONDARY FILTER: custom_style (but exclude Hardware and Caps from style filtering)
-        if style:
-            where_conditions.append("(i.custom_style = %s OR i.custom_material_class IN ('Hardware', 'Cap'))")
-            query_params.append(style)
-            frappe.logger().info(f"POS API Debug - Secondary filter (custom_style): '{style}' (Hardware/Caps exempted)")
-        
-        # HEIGHT FILTER: Use Item Attribute system (exclude Hardware and Caps)
-        if height:
-            where_conditions.append("""
-                (i.custom_material_class NOT IN ('Hardware', 'Cap') AND EXISTS (
-                    SELECT 1 FROM `tabItem Variant Attribute` iva 
-                    WHERE iva.parent = i.name 
-                    AND iva.attribute = 'Fence Height' 
-                    AND iva.attribute_value = %s
-                )) OR i.custom_material_class IN ('Hardware', 'Cap')
-            """)
-            query_params.append(height)
-            frappe.logger().info(f"POS API Debug - Height filter (attribute): '{height}' (Hardware/Caps exempted)")
-        
-        # COLOR FILTER: Use Item Attribute system (include Hardware and Caps)
-        if color:
-            # Map color names to abbreviations
-            color_mapping = {
-                'White': 'WHI',
-                'Khaki': 'Kha', 
-                'Tan': 'Tan',
-                'Black': 'BLA',
-                'Gray': 'Gry'
-            }
-            color_abbreviation = color_mapping.get(color, color)
-            
-            where_conditions.append("""
-                EXISTS (
-                    SELECT 1 FROM `tabItem Variant Attribute` iva 
-                    WHERE iva.parent = i.name 
-                    AND iva.attribute = 'Color' 
-                    AND iva.attribute_value = %s
+    rows = frappe.cache().get_value(key)
+    if rows is None:
+        rows = fetch_pos_item_rows(*filters)
+        frappe.cache().set_value(key, rows, expires_in_sec=60)
+    
+    return rows
+
+def get_cache_generation(name):
+    """Generation token included in a family of cache keys; a new one orphans every key in it"""
+    generation = frappe.cache().get_value(f"{name}_generation")
+    if not generation:
+        generation = bump_cache_generation(name)
+    return generation
+
+def bump_cache_generation(name):
+    """Invalidate a key family in O(1) instead of a KEYS scan; the old keys simply expire"""
+    generation = frappe.generate_hash(length=10)
+    frappe.cache().set_value(f"{name}_generation", generation)
+    return generation
+
+def clear_pos_items_cache(doc=None, method=None):
+    """Drop every cached page of POS item rows; runs on every Item save, so it must stay O(1)"""
+    bump_cache_generation("pos_items")
+    frappe.cache().delete_value("pos_item_field_usage")
+
+def item_field_in_use(fieldname, value):
+    """Whether an enabled Item has fieldname = value; cached in redis until an Item changes"""
+    return frappe.cache().hget("pos_item_field_usage", f"{fieldname}:{value}",
+        generator=lambda: bool(frappe.db.exists("Item", {fieldname: value, "disabled": 0})))
+
+def get_analysis_cached(key, generator):
+    """
+    Cache the result of a read-only analysis endpoint for two minutes.
+    Failed results are not cached so the next call retries.
+    """
+    key = f"pos_analysis:{key}"
+    cached = frappe.cache().get_value(key)
+    if cached:
+        return cached
+    
+    result = generator()
+    if result.get("success"):
+        frappe.cache().set_value(key, result, expires_in_sec=120)
+    
+    return result
+
+def clear_pos_analysis_cache(doc=None, method=None):
+    """Drop every cached analysis endpoint result"""
+    frappe.cache().delete_keys("pos_analysis:")
+
+# Color names shown in the POS -> Color attribute values stored on items
+_COLOR_ABBREV = {
+    'White': 'WHI',
+    'Khaki': 'Kha',
+    'Tan': 'Tan',
+    'Black': 'BLA',
+    'Gray': 'Gry'
+}
+
+# Fence component type -> item name keywords, in precedence order. Both
+# classify_fence_component and the component_type column of the POS item query use it
+_COMPONENT_KEYWORDS = (
+    ("panels", ("panel",)),
+    ("posts", ("post",)),
+    ("gates", ("gate",)),
+    ("caps", ("cap",)),
+    ("hardware", ("hinge", "latch", "hardware", "bracket")),
+)
+
+# One named group per component type. The branches are tried in precedence order and each
+# looks ahead over the whole name, so "Cap for Panel" is still a panel
+_COMPONENT_RE = re.compile(
+    "^(?:" + "|".join(
+        f"(?=.*?(?P<{kind}>{'|'.join(map(re.escape, keywords))}))"
+        for kind, keywords in _COMPONENT_KEYWORDS
+    ) + ")",
+    re.I | re.S,
+)
+
+def component_type_sql(column):
+    """SQL CASE with the same rules as classify_fence_component (NULL for a blank name)"""
+    whens = "".join(
+        "\n                WHEN {} THEN '{}'".format(
+            " OR ".join(f"LOWER({column}) LIKE '%%{keyword}%%'" for keyword in keywords), kind
+        )
+        for kind, keywords in _COMPONENT_KEYWORDS
+    )
+    return f"""CASE
+                WHEN IFNULL({column}, '') = '' THEN NULL{whens}
+                ELSE 'other'
+            END"""
+
+@functools.lru_cache(maxsize=128)
+def build_pos_items_query(has_category, has_style, has_height, has_color, has_rail_type, has_cursor, page_size, include_web_fields):
+    """
+    SQL for one page of POS items. Placeholders are in this order:
+    category (x2), style, height, color, rail type + category, cursor (x3).
+    """
+    # Start with base item filtering (only sellable variants, not templates)
+    where_conditions = [
+        "i.disabled = 0", 
+        "i.is_sales_item = 1",
+        "i.is_sellable = 1"
+    ]
+    
+    if has_category:
+        # For Cap and Hardware items, also check custom_type_of_material field
+        where_conditions.append("""
+            (i.custom_material_type = %s 
+            OR (i.custom_material_class IN ('Cap', 'Hardware') 
+                AND i.name IN (
+                    SELECT parent 
+                    FROM `tabCustom Type Of Material` 
+                    WHERE material_type = %s
                 )
-            """)
-            query_params.append(color_abbreviation)
-            frappe.logger().info(f"POS API Debug - Color filter (attribute): '{color}' -> '{color_abbreviation}'")
-        
-        # RAIL TYPE FILTER: Use Item Attribute system (exclude Hardware and Caps)
-        if railType:
-            where_conditions.append("""
-                (i.custom_material_class NOT IN ('Hardware', 'Cap') AND EXISTS (
-                    SELECT 1 FROM `tabItem Variant Attribute` iva 
-                    WHERE iva.parent = i.name 
-                    AND iva.attribute = 'Rail Type' 
-                    AND iva.attribute_value = %s
-                )) OR (i.custom_material_class IN ('Hardware', 'Cap') AND i.custom_material_type = %s)
-            """)
-            query_params.extend([railType, category])
-            frappe.logger().info(f"POS API Debug - Rail Type filter (attribute): '{railType}' (Hardware/Caps exempted but must match material type)")
-        
-        # Build the complete query
-        where_clause = " AND ".join(where_conditions)
-        
-        # ENHANCED QUERY with ATTRIBUTES for sub-segmentation
-        items_query = f"""
-            SELECT DISTINCT
-                i.name,
-                i.item_name,
-                i.item_code,
-                i.item_group,
-                i.stock_uom,
-                i.image,
-                i.has_variants,
-                i.variant_of,
-                i.custom_material_type,
-                i.custom_material_class,
-                i.custom_style,
-                wi.web_item_name,
-                wi.website_image,
-                wi.route,
-                wi.short_description,
-                wi.published,
-                -- Add attribute data for sub-segmentation
-                GROUP_CONCAT(
-                    CONCAT(iva.attribute, ':', iva.attribute_value) 
-                    ORDER BY iva.attribute 
-                    SEPARATOR '|'
-                ) as attributes
+            ))
+        """)
+    
+    if has_style:
+        where_conditions.append("(i.custom_style = %s OR i.custom_material_class IN ('Hardware', 'Cap'))")
+    
+    if has_height:
+        where_conditions.append("""
+            ((i.custom_material_class NOT IN ('Hardware', 'Cap') AND i.name IN (
+                SELECT iva.parent FROM `tabItem Variant Attribute` iva 
+                WHERE iva.attribute = 'Fence Height' 
+                AND iva.attribute_value = %s
+            )) OR i.custom_material_class IN ('Hardware', 'Cap'))
+        """)
+    
+    if has_color:
+        where_conditions.append("""
+            i.name IN (
+                SELECT iva.parent FROM `tabItem Variant Attribute` iva 
+                WHERE iva.attribute = 'Color' 
+                AND iva.attribute_value = %s
+            )
+        """)
+    
+    if has_rail_type:
+        where_conditions.append("""
+            ((i.custom_material_class NOT IN ('Hardware', 'Cap') AND i.name IN (
+                SELECT iva.parent FROM `tabItem Variant Attribute` iva 
+                WHERE iva.attribute = 'Rail Type' 
+                AND iva.attribute_value = %s
+            )) OR (i.custom_material_class IN ('Hardware', 'Cap') AND i.custom_material_type = %s))
+        """)
+    
+    if has_cursor:
+        where_conditions.append(
+            "(IFNULL(i.custom_material_class, ''), IFNULL(i.item_name, ''), i.name) > (%s, %s, %s)"
+        )
+    
+    where_clause = " AND ".join(where_conditions)
+    
+    # Website Item columns are optional; the lite path skips the join entirely
+    if include_web_fields:
+        web_select = """
+            wi.web_item_name,
+            wi.website_image,
+            wi.route,
+            wi.short_description,
+            wi.published,"""
+        web_join = "LEFT JOIN `tabWebsite Item` wi ON wi.item_code = i.name"
+    else:
+        web_select = """
+            NULL as web_item_name,
+            NULL as website_image,
+            NULL as route,
+            NULL as short_description,
+            0 as published,"""
+        web_join = ""
+    
+    # ENHANCED QUERY with ATTRIBUTES for sub-segmentation
+    items_query = f"""
+        SELECT
+            i.name,
+            i.item_name,
+            i.item_code,
+            i.item_group,
+            i.stock_uom,
+            i.image,
+            i.has_variants,
+            i.variant_of,
+            i.custom_material_type,
+            i.custom_material_class,
+            i.custom_style,{web_select}
+            -- Component classification (same rules as classify_fence_component)
+            {component_type_sql("i.item_name")} as component_type
+        FROM (
+            -- Deferred join: filter, sort and limit on narrow Item rows first
+            SELECT i.name
             FROM `tabItem` i
-            LEFT JOIN `tabWebsite Item` wi ON wi.item_code = i.name
-            LEFT JOIN `tabItem Variant Attribute` iva ON iva.parent = i.name
             WHERE {where_clause}
-            GROUP BY i.name, i.item_name, i.item_code, i.item_group, i.stock_uom, 
-                     i.image, i.has_variants, i.variant_of, i.custom_material_type, 
-                     i.custom_material_class, i.custom_style, wi.web_item_name, 
-                     wi.website_image, wi.route, wi.short_description, wi.published
-            ORDER BY i.custom_material_class, i.item_name
-            LIMIT 100
-        """
-        
-        frappe.logger().info(f"POS API Debug - Complete WHERE clause: {where_clause}")
-        frappe.logger().info(f"POS API Debug - Query params: {query_params}")
+            ORDER BY IFNULL(i.custom_material_class, ''), IFNULL(i.item_name, ''), i.name
+            LIMIT {page_size}
+        ) page
+        INNER JOIN `tabItem` i ON i.name = page.name
+        {web_join}
+        ORDER BY IFNULL(i.custom_material_class, ''), IFNULL(i.item_name, ''), i.name
+    """
+    
+    return items_query
+
+def fetch_pos_item_rows(category, height, color, style, railType, cursor, page_size, include_web_fields):
+    """Run the POS item query for one page; rows are tuples in SELECT order"""
+    # Include Hardware and Cap items in the main query
+    # These should be filtered by material type and color, but not by style/height/rail type
+    query_params = []
+    
+    # PRIMARY FILTER: custom_material_type (Cap/Hardware also match on custom_type_of_material)
+    if category:
+        query_params.extend([category, category])
+        logger.debug("POS API Debug - Primary filter (custom_material_type): '%s' (including custom_type_of_material for Cap/Hardware)", category)
+    
+    # SECONDARY FILTER: custom_style (but exclude Hardware and Caps from style filtering)
+    if style:
+        query_params.append(style)
+        logger.debug("POS API Debug - Secondary filter (custom_style): '%s' (Hardware/Caps exempted)", style)
+    
+    # HEIGHT FILTER: Use Item Attribute system (exclude Hardware and Caps)
+    if height:
+        query_params.append(height)
+        logger.debug("POS API Debug - Height filter (attribute): '%s' (Hardware/Caps exempted)", height)
+    
+    # COLOR FILTER: Use Item Attribute system (include Hardware and Caps)
+    if color:
+        # Map color names to abbreviations
+        color_abbreviation = _COLOR_ABBREV.get(color, color)
+        query_params.append(color_abbreviation)
+        logger.debug("POS API Debug - Color filter (attribute): '%s' -> '%s'", color, color_abbreviation)
+    
+    # RAIL TYPE FILTER: Use Item Attribute system (exclude Hardware and Caps)
+    if railType:
+        query_params.extend([railType, category])
+        logger.debug("POS API Debug - Rail Type filter (attribute): '%s' (Hardware/Caps exempted but must match material type)", railType)
+    
+    # KEYSET PAGINATION: resume after the last row of the previous page
+    if cursor:
+        query_params.extend(decode_pos_cursor(cursor))
+    
+    # The SQL text only depends on which filters are set, so it is built once per shape
+    items_query = build_pos_items_query(
+        bool(category), bool(style), bool(height), bool(color), bool(railType), bool(cursor),
+        page_size, include_web_fields
+    )
+    
+    logger.debug("POS API Debug - Complete query: %s", items_query)
+    logger.debug("POS API Debug - Query params: %s", query_params)
+    
+    # Plain tuples: get_fence_items_for_pos unpacks them positionally, in SELECT order
+    items = frappe.db.sql(items_query, query_params)
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("POS API Debug - Items found: %s", len(items))
+        logger.debug("POS API Debug - Sample items: %s", [(row[1] or 'N/A')[:50] for row in items[:3]])
+    
+    return items
+
+@frappe.whitelist()
+def get_fence_items_for_pos(category=None, height=None, color=None, style=None, railType=None, price_list=None, cursor=None, page_size=100, include_web_fields=1):
+    """Get fence items for POS using SIMPLE filtering: custom_material_type -> custom_style -> sort by custom_material_class"""
+    
+    logger.debug("POS API Debug - Called with price list: %s", price_list)
+    
+    try:
+        page_size = max(1, min(cint(page_size) or 100, 500))
         
-        items = frappe.db.sql(items_query, query_params, as_dict=True)
+        # The item rows are cached briefly; prices and stock below are always live
+        items = get_pos_item_rows(
+            category, height, color, style, railType, cursor, page_size, bool(cint(include_web_fields))
+        )
         
-        frappe.logger().info(f"POS API Debug - Items found: {len(items)}")
-        if items:
-            frappe.logger().info(f"POS API Debug - Sample items: {[item.get('item_name', 'N/A')[:50] for item in items[:3]]}")
+        # Attributes, prices and stock for all rows in one round trip instead of per item
+        item_codes = [row[0] for row in items]
+        item_attributes, prices, stock_qtys = get_pos_item_enrichment(item_codes, price_list)
         
         # Format items for POS display
         formatted_items = []
-        for item in items:
-            # Parse attributes string into object
-            attributes = {}
-            if item.attributes:
-                for attr_pair in item.attributes.split('|'):
-                    if ':' in attr_pair:
-                        attr_name, attr_value = attr_pair.split(':', 1)
-                        attributes[attr_name] = attr_value
+        for (
+            name, item_name, item_code, item_group, stock_uom, image, has_variants, variant_of,
+            material_type, material_class, item_style, web_item_name, website_image, route,
+            short_description, published, component_type
+        ) in items:
+            # Attribute data for sub-segmentation
+            attributes = item_attributes.get(name, {})
             
             formatted_item = {
-                "name": item.name,
-                "item_name": item.item_name or item.name,
-                "item_code": item.item_code or item.name,
-                "item_group": item.item_group,
-                "stock_uom": item.stock_uom,
-                "image": item.website_image or item.image,
-                "route": item.route,
-                "published_in_website": bool(item.published),
-                "short_description": item.short_description,
-                "has_variants": item.has_variants,
-                "variant_of": item.variant_of,
-                "custom_material_type": item.custom_material_type,
-                "custom_material_class": item.custom_material_class,
-                "custom_style": item.custom_style,
-                "web_item_name": item.web_item_name or item.item_name,
+                "name": name,
+                "item_name": item_name or name,
+                "item_code": item_code or name,
+                "item_group": item_group,
+                "stock_uom": stock_uom,
+                "image": website_image or image,
+                "route": route,
+                "published_in_website": bool(published),
+                "short_description": short_description,
+                "has_variants": has_variants,
+                "variant_of": variant_of,
+                "custom_material_type": material_type,
+                "custom_material_class": material_class,
+                "custom_style": item_style,
+                "web_item_name": web_item_name or item_name,
                 "attributes": attributes
             }
             
             # Add pricing for specific price list
             if price_list:
-                item_price = get_item_price_for_pos(item.name, price_list)
+                item_price = prices.get(name)
                 if item_price:
                     formatted_item["pos_price"] = item_price
                     formatted_item["price_list_rate"] = item_price  # Frontend compatibility
-                    print(f"✅ Price found for {item.name}: {item_price} in {price_list}")
                 else:
-                    print(f"❌ No price found for {item.name} in {price_list}")
+                    logger.debug("POS API Debug - No price found for %s in %s", name, price_list)
                     formatted_item["price_list_rate"] = 0
                     formatted_item["pos_price"] = 0
             
             # Add stock information
-            formatted_item["stock_qty"] = get_item_stock_qty(item.name)
+            formatted_item["stock_qty"] = stock_qtys.get(name, 0.0)
             
-            # Add fence-specific metadata
-            formatted_item["fence_metadata"] = get_fence_item_metadata(item.name)
+            # Add fence-specific metadata (attributes + component type from the main query)
+            fence_metadata = dict(attributes)
+            if component_type:
+                fence_metadata["component_type"] = component_type
+            formatted_item["fence_metadata"] = fence_metadata
             
             formatted_items.append(formatted_item)
         
-        frappe.logger().info(f"POS API Debug - Final formatted items: {len(formatted_items)}")
+        # A full page means there may be more rows after the last one
+        next_cursor = None
+        if len(items) == page_size:
+            last = formatted_items[-1]
+            next_cursor = encode_pos_cursor(last["custom_material_class"], items[-1][1], last["name"])
+        
+        logger.debug("POS API Debug - Final formatted items: %s", len(formatted_items))
         return {
             "items": formatted_items, 
             "item_count": len(formatted_items),
+            "next_cursor": next_cursor,
             "debug_price_list": price_list
         }
         
     except Exception as e:
         frappe.log_error(f"Error in get_fence_items_for_pos: {str(e)}")
-        frappe.logger().error(f"POS API Error: {str(e)}")
+        logger.error("POS API Error: %s", e)
         return {"items": [], "item_count": 0}
 
+def encode_pos_cursor(material_class, item_name, name):
+    """Encode the sort key of the last POS item row as an opaque page cursor"""
+    key = [material_class or "", item_name or "", name]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_pos_cursor(cursor):
+    """Decode a page cursor from encode_pos_cursor back into its sort key"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError):
+        frappe.throw(_("Invalid page cursor"))
+    if not isinstance(key, list) or len(key) != 3:
+        frappe.throw(_("Invalid page cursor"))
+    return key
+
+
+def item_has_material_condition():
+    """
+    SQL predicate for items with a material type.
+    Uses the stored has_material column when the add_item_has_material_column patch has run.
+    """
+    if frappe.db.has_column("Item", "has_material"):
+        return "has_material = 1"
+    return "custom_material_type != ''"
+
+
+def pos_sellable_item_condition(Item):
+    """frappe.qb criterion shared by the POS item queries: enabled, sellable variants only"""
+    return (Item.disabled == 0) & (Item.is_sales_item == 1) & (Item.is_sellable == 1)
+
+def pos_material_type_condition(Item, material_type):
+    """frappe.qb criterion matching a POS category on custom_material_type or item_group"""
+    return (Item.custom_material_type == material_type) | (Item.item_group == material_type)
+
 @frappe.whitelist()
 def get_fence_items_for_pos_original(category=None, height=None, color=None, style=None, price_list=None):
     """Original fence items logic as fallback"""
@@ -265,12 +519,7 @@ def get_fence_items_for_pos_original(category=None, height=None, color=None, sty
     
     if category:
         # Try to check if items exist with custom_material_type first
-        custom_material_items = frappe.db.count("Item", {
-            "custom_material_type": category,
-            "disabled": 0
-        })
-        
-        if custom_material_items > 0:
+        if item_field_in_use("custom_material_type", category):
             # Filter by custom_material_type field if items exist
             query_args["field_filters"]["custom_material_type"] = category
         else:
@@ -280,12 +529,7 @@ def get_fence_items_for_pos_original(category=None, height=None, color=None, sty
     # Add custom field filters first (higher priority than attributes)
     if style:
         # Try custom_style field first
-        custom_style_items = frappe.db.count("Item", {
-            "custom_style": style,
-            "disabled": 0
-        })
-        
-        if custom_style_items > 0:
+        if item_field_in_use("custom_style", style):
             # Use custom_style field directly
             query_args["field_filters"]["custom_style"] = style
         else:
@@ -312,86 +556,104 @@ def get_fence_items_for_pos_original(category=None, height=None, color=None, sty
     
     try:
         # Debug logging
-        frappe.logger().info(f"POS API Debug - Query args: {query_args}")
-        frappe.logger().info(f"POS API Debug - Attribute mapping: {attr_mapping}")
-        frappe.logger().info(f"POS API Debug - Attribute filters: {attribute_filters}")
+        logger.debug("POS API Debug - Query args: %s", query_args)
+        logger.debug("POS API Debug - Attribute mapping: %s", attr_mapping)
+        logger.debug("POS API Debug - Attribute filters: %s", attribute_filters)
         
         # Use existing product filter system
         result = get_product_filter_data(query_args)
         
         # Debug the result
-        item_count = len(result.get("items", []))
-        frappe.logger().info(f"POS API Debug - Found {item_count} items")
+        logger.debug("POS API Debug - Found %s items", len(result.get('items', [])))
         
         # Enhance with POS-specific data
         if result.get("items"):
+            # Prices for every item in one lookup instead of one per item
+            item_codes = [item.get("name") for item in result["items"]]
+            prices = get_item_prices_for_pos(item_codes, price_list) if price_list else {}
+            # Stock from one Bin query against the default warehouse, resolved once
+            stock_qtys = get_item_stock_qtys(item_codes)
+            # Attributes for every item in one query; the listing already carries item_name
+            metadata = get_fence_items_metadata([
+                frappe._dict(name=item.get("name"), item_name=item.get("item_name"))
+                for item in result["items"]
+            ])
+            
             for item in result["items"]:
                 # Add pricing for specific price list
-                if price_list:
-                    item_price = get_item_price_for_pos(item.get("name"), price_list)
-                    if item_price:
-                        item["pos_price"] = item_price
+                item_price = prices.get(item.get("name"))
+                if item_price:
+                    item["pos_price"] = item_price
                 
                 # Add stock information
-                item["stock_qty"] = get_item_stock_qty(item.get("name"))
+                item["stock_qty"] = stock_qtys.get(item.get("name"), 0)
                 
                 # Add fence-specific metadata
-                item["fence_metadata"] = get_fence_item_metadata(item.get("name"))
+                item["fence_metadata"] = metadata.get(item.get("name"), {})
         
         return result
         
     except Exception as e:
         frappe.log_error(f"Error in get_fence_items_for_pos: {str(e)}")
-        frappe.logger().error(f"POS API Error - Query args: {query_args}, Error: {str(e)}")
+        logger.error("POS API Error - Query args: %s, Error: %s", query_args, e)
         return {"items": [], "item_count": 0}
 
+# Columns of the get_popular_items_for_pos query, in SELECT order
+PopularItemRow = namedtuple("PopularItemRow", (
+    "name item_name item_code item_group stock_uom image has_variants variant_of "
+    "custom_material_type custom_material_class web_item_name website_image route "
+    "short_description published"
+))
+
 @frappe.whitelist()
 def get_popular_items_for_pos(price_list=None, material_type=None):
     """Get popular items for POS using custom_popular field - includes variants and material type filtering"""
     
     try:
-        # Build WHERE conditions
-        where_conditions = [
-            "i.custom_popular = 1",
-            "i.disabled = 0",
-            "i.is_sales_item = 1",
-            "(i.has_variants = 0 OR i.variant_of IS NOT NULL)"
-        ]
+        Item = frappe.qb.DocType("Item")
+        WebsiteItem = frappe.qb.DocType("Website Item")
         
-        query_params = []
+        # Get items directly from Item doctype including variants
+        query = (
+            frappe.qb.from_(Item)
+            .left_join(WebsiteItem).on(WebsiteItem.item_code == Item.name)
+            .select(
+                Item.name,
+                Item.item_name,
+                Item.item_code,
+                Item.item_group,
+                Item.stock_uom,
+                Item.image,
+                Item.has_variants,
+                Item.variant_of,
+                Item.custom_material_type,
+                Item.custom_material_class,
+                WebsiteItem.web_item_name,
+                WebsiteItem.website_image,
+                WebsiteItem.route,
+                WebsiteItem.short_description,
+                WebsiteItem.published
+            )
+            .where(Item.custom_popular == 1)
+            .where(pos_sellable_item_condition(Item))
+            .orderby(Item.item_name)
+        )
         
         # Add material type filtering if provided
         if material_type and material_type != 'all':
-            where_conditions.append("(i.custom_material_type = %s OR i.item_group = %s)")
-            query_params.extend([material_type, material_type])
+            query = query.where(pos_material_type_condition(Item, material_type))
         
-        where_clause = " AND ".join(where_conditions)
+        # Plain tuples bound to a namedtuple instead of a dict per row
+        popular_items = [PopularItemRow(*row) for row in query.run()]
         
-        # Get items directly from Item doctype including variants
-        popular_items = frappe.db.sql(f"""
-            SELECT 
-                i.name, 
-                i.item_name,
-                i.item_code,
-                i.item_group,
-                i.stock_uom,
-                i.image,
-                i.has_variants,
-                i.variant_of,
-                i.custom_material_type,
-                i.custom_material_class,
-                wi.web_item_name,
-                wi.website_image,
-                wi.route,
-                wi.short_description,
-                wi.published
-            FROM `tabItem` i
-            LEFT JOIN `tabWebsite Item` wi ON wi.item_code = i.name
-            WHERE {where_clause}
-            ORDER BY i.item_name
-        """, query_params, as_dict=True)
+        logger.debug("POS API Debug - Found %s popular items including variants", len(popular_items))
         
-        frappe.logger().info(f"POS API Debug - Found {len(popular_items)} popular items including variants")
+        # Attributes, prices and stock for all rows in one round trip instead of per item
+        item_codes = [item.name for item in popular_items]
+        metadata, prices, stock_qtys = get_pos_item_enrichment(item_codes, price_list)
+        for item in popular_items:
+            if item.item_name:
+                metadata[item.name]["component_type"] = classify_fence_component(item.item_name)
         
         # Format items for POS display
         formatted_items = []
@@ -415,21 +677,20 @@ def get_popular_items_for_pos(price_list=None, material_type=None):
             
             # Add pricing for specific price list
             if price_list:
-                item_price = get_item_price_for_pos(item.name, price_list)
+                item_price = prices.get(item.name)
                 if item_price:
                     formatted_item["pos_price"] = item_price
                     formatted_item["price_list_rate"] = item_price  # Frontend compatibility
-                    print(f"✅ Price found for {item.name}: {item_price} in {price_list}")
                 else:
-                    print(f"❌ No price found for {item.name} in {price_list}")
+                    logger.debug("POS API Debug - No price found for %s in %s", item.name, price_list)
                     formatted_item["price_list_rate"] = 0
                     formatted_item["pos_price"] = 0
             
             # Add stock information
-            formatted_item["stock_qty"] = get_item_stock_qty(item.name)
+            formatted_item["stock_qty"] = stock_qtys.get(item.name, 0.0)
             
             # Add fence-specific metadata
-            formatted_item["fence_metadata"] = get_fence_item_metadata(item.name)
+            formatted_item["fence_metadata"] = metadata.get(item.name, {})
             
             formatted_items.append(formatted_item)
         
@@ -441,7 +702,7 @@ def get_popular_items_for_pos(price_list=None, material_type=None):
         
     except Exception as e:
         frappe.log_error(f"Error in get_popular_items_for_pos: {str(e)}")
-        frappe.logger().error(f"POS API Popular Items Error: {str(e)}")
+        logger.error("POS API Popular Items Error: %s", e)
         return {"items": [], "item_count": 0}
 
 @frappe.whitelist()
@@ -474,13 +735,14 @@ def setup_popular_items_field():
                                             limit=5-len(items))
             items.extend(standalone_items)
         
-        count = 0
-        for item in items:
-            try:
-                frappe.db.set_value("Item", item.name, "custom_popular", 1)
-                count += 1
-            except Exception as e:
-                continue
+        # One UPDATE for every item instead of a set_value per item
+        if items:
+            frappe.db.sql("""
+                UPDATE `tabItem`
+                SET custom_popular = 1, modified = %s, modified_by = %s
+                WHERE name IN %s
+            """, (frappe.utils.now(), frappe.session.user, tuple(item.name for item in items)))
+        count = len(items)
         
         frappe.db.commit()
         # Get summary info about what was marked
@@ -502,27 +764,50 @@ def setup_popular_items_field():
 def check_item_variants_status():
     """Debug function to check item variant status"""
     try:
-        # Get summary of items by type
-        template_count = frappe.db.count("Item", {"has_variants": 1, "disabled": 0, "is_sales_item": 1})
-        variant_count = frappe.db.count("Item", {"variant_of": ["is", "set"], "disabled": 0, "is_sales_item": 1})
-        standalone_count = frappe.db.count("Item", {"has_variants": 0, "variant_of": ["is", "not set"], "disabled": 0, "is_sales_item": 1})
-        popular_count = frappe.db.count("Item", {"custom_popular": 1, "disabled": 0})
-        
-        # Get some examples
-        templates = frappe.get_all("Item", 
-                                 filters={"has_variants": 1, "disabled": 0, "is_sales_item": 1}, 
-                                 fields=["name", "item_name"], 
-                                 limit=3)
-        
-        variants = frappe.get_all("Item", 
-                                filters={"variant_of": ["is", "set"], "disabled": 0, "is_sales_item": 1}, 
-                                fields=["name", "item_name", "variant_of"], 
-                                limit=3)
-        
-        popular = frappe.get_all("Item", 
-                               filters={"custom_popular": 1, "disabled": 0}, 
-                               fields=["name", "item_name", "has_variants", "variant_of"], 
-                               limit=5)
+        # Get summary of items by type in one pass
+        counts = frappe.db.sql("""
+            SELECT
+                SUM(is_sales_item = 1 AND has_variants = 1) as template_count,
+                SUM(is_sales_item = 1 AND IFNULL(variant_of, '') != '') as variant_count,
+                SUM(is_sales_item = 1 AND has_variants = 0 AND IFNULL(variant_of, '') = '') as standalone_count,
+                SUM(custom_popular = 1) as popular_count
+            FROM `tabItem`
+            WHERE disabled = 0
+        """, as_dict=True)[0]
+        template_count = cint(counts.template_count)
+        variant_count = cint(counts.variant_count)
+        standalone_count = cint(counts.standalone_count)
+        popular_count = cint(counts.popular_count)
+        
+        # Get some examples (most recently modified first, like get_all)
+        examples = frappe.db.sql("""
+            (SELECT 'templates' as kind, name, item_name, has_variants, variant_of
+            FROM `tabItem`
+            WHERE has_variants = 1 AND disabled = 0 AND is_sales_item = 1
+            ORDER BY modified DESC LIMIT 3)
+            UNION ALL
+            (SELECT 'variants', name, item_name, has_variants, variant_of
+            FROM `tabItem`
+            WHERE IFNULL(variant_of, '') != '' AND disabled = 0 AND is_sales_item = 1
+            ORDER BY modified DESC LIMIT 3)
+            UNION ALL
+            (SELECT 'popular', name, item_name, has_variants, variant_of
+            FROM `tabItem`
+            WHERE custom_popular = 1 AND disabled = 0
+            ORDER BY modified DESC LIMIT 5)
+        """, as_dict=True)
+        
+        templates, variants, popular = [], [], []
+        for row in examples:
+            if row.kind == "templates":
+                templates.append({"name": row.name, "item_name": row.item_name})
+            elif row.kind == "variants":
+                variants.append({"name": row.name, "item_name": row.item_name, "variant_of": row.variant_of})
+            else:
+                popular.append({
+                    "name": row.name, "item_name": row.item_name,
+                    "has_variants": row.has_variants, "variant_of": row.variant_of
+                })
         
         return {
             "success": True,
@@ -543,35 +828,33 @@ def check_item_variants_status():
         return {"success": False, "message": str(e)}
 
 @frappe.whitelist()
-def get_template_items_for_pos(category=None):
+def get_template_items_for_pos(category=None, price_list=None):
     """Get template items (has_variants=1) for POS - simplified version"""
     try:
-        where_conditions = ["i.disabled = 0", "i.is_sales_item = 1"]
-        query_params = []
+        Item = frappe.qb.DocType("Item")
+        
+        # Get all sellable items including templates
+        query = (
+            frappe.qb.from_(Item)
+            .select(
+                Item.name,
+                Item.item_name,
+                Item.item_group,
+                Item.has_variants,
+                Item.custom_material_type,
+                Item.custom_material_class
+            )
+            .where(Item.disabled == 0)
+            .where(Item.is_sales_item == 1)
+            .orderby(Item.item_name)
+            .limit(20)
+        )
         
         # Category filtering
         if category:
-            where_conditions.append("(i.custom_material_type = %s OR i.item_group = %s)")
-            query_params.extend([category, category])
-        
-        where_clause = " AND ".join(where_conditions)
-        
-        # Get all sellable items including templates
-        items_query = f"""
-            SELECT 
-                i.name,
-                i.item_name,
-                i.item_group,
-                i.has_variants,
-                i.custom_material_type,
-                i.custom_material_class
-            FROM `tabItem` i
-            WHERE {where_clause}
-            ORDER BY i.item_name
-            LIMIT 20
-        """
+            query = query.where(pos_material_type_condition(Item, category))
         
-        items = frappe.db.sql(items_query, query_params, as_dict=True)
+        items = query.run(as_dict=True)
         
         # Format items simply
         formatted_items = []
@@ -603,30 +886,34 @@ def get_template_items_for_pos(category=None):
 def get_fence_items_for_pos_simple(category=None, style=None):
     """Simplified version to get items directly from Website Item with custom_style support"""
     try:
-        filters = {"published": 1}
-        
-        # Build WHERE conditions
-        where_conditions = ["wi.published = 1", "i.disabled = 0"]
-        params = []
+        Item = frappe.qb.DocType("Item")
+        WebsiteItem = frappe.qb.DocType("Website Item")
+        
+        query = (
+            frappe.qb.from_(WebsiteItem)
+            .inner_join(Item).on(WebsiteItem.item_code == Item.name)
+            .select(
+                WebsiteItem.name,
+                WebsiteItem.item_code,
+                WebsiteItem.web_item_name,
+                WebsiteItem.route,
+                WebsiteItem.website_image,
+                Item.custom_material_type,
+                Item.custom_style,
+                Item.item_group
+            )
+            .where(WebsiteItem.published == 1)
+            .where(Item.disabled == 0)
+            .limit(50)
+        )
         
         if category:
-            where_conditions.append("(i.custom_material_type = %s OR i.item_group = %s)")
-            params.extend([category, category])
+            query = query.where(pos_material_type_condition(Item, category))
         
         if style:
-            where_conditions.append("i.custom_style = %s")
-            params.append(style)
-        
-        where_clause = " AND ".join(where_conditions)
+            query = query.where(Item.custom_style == style)
         
-        items = frappe.db.sql(f"""
-            SELECT wi.name, wi.item_code, wi.web_item_name, wi.route, wi.website_image,
-                   i.custom_material_type, i.custom_style, i.item_group
-            FROM `tabWebsite Item` wi
-            INNER JOIN tabItem i ON wi.item_code = i.name
-            WHERE {where_clause}
-            LIMIT 50
-        """, params, as_dict=True)
+        items = query.run(as_dict=True)
         
         return {"items": items}
             
@@ -638,51 +925,87 @@ def get_fence_items_for_pos_simple(category=None, style=None):
 def get_item_price_for_pos(item_code, price_list):
     """Get item price for specific price list"""
     try:
-        price = frappe.get_value("Item Price", {
-            "item_code": item_code,
-            "price_list": price_list
-        }, "price_list_rate")
-        
-        if not price:
-            # Smart fallback: try other enabled price lists from the system
-            try:
-                other_price_lists = frappe.get_all("Price List", 
-                    filters={"enabled": 1}, 
-                    fields=["name"], 
-                    pluck="name"
-                )
-                
-                for fallback_list in other_price_lists:
-                    if fallback_list == price_list:
-                        continue  # Already tried
-                        
-                    try:
-                        price = frappe.get_value("Item Price", {
-                            "item_code": item_code,
-                            "price_list": fallback_list
-                        }, "price_list_rate")
-                        
-                        if price:
-                            frappe.logger().info(f"Found fallback price for {item_code} in {fallback_list}: {price}")
-                            break
-                    except Exception:
-                        continue
-            except Exception as e:
-                frappe.logger().error(f"Error getting fallback price lists: {str(e)}")
-        
-        return float(price) if price else 0.0
+        # The same pair is priced several times while one cart request is handled
+        return get_request_cached(f"price:{item_code}:{price_list or ''}",
+            lambda: get_cached_item_price(item_code, price_list))
         
     except Exception as e:
         frappe.log_error(f"Error getting price for {item_code}: {str(e)}")
         return 0.0
 
+def get_cached_item_price(item_code, price_list):
+    """
+    Item price from redis, one hash per item with a field per price list.
+    The hash expires after an hour, so a change no hook sees is picked up eventually
+    """
+    key = f"pos_price:{get_cache_generation('pos_price')}:{item_code}"
+    rate = frappe.cache().hget(key, price_list or "")
+    if rate is None:
+        rate = fetch_item_price_for_pos(item_code, price_list)
+        frappe.cache().hset(key, price_list or "", rate)
+        frappe.cache().expire(frappe.cache().make_key(key), 3600)
+    return rate
+
+def fetch_item_price_for_pos(item_code, price_list):
+    """Read the item price from the database, falling back to other enabled price lists"""
+    price_lists = get_price_list_preference(price_list)
+    if not price_lists:
+        return 0.0
+    
+    # First available rate in preference order, in one query whatever the number of lists
+    params = {"item_code": item_code}
+    rank_sql = price_list_rank_sql(price_lists, params)
+    rate = frappe.db.sql(f"""
+        SELECT price_list_rate
+        FROM `tabItem Price`
+        WHERE item_code = %(item_code)s
+            AND price_list IN %(price_lists)s
+            AND price_list_rate > 0
+        ORDER BY {rank_sql}
+        LIMIT 1
+    """, params)
+    
+    return float(rate[0][0]) if rate else 0.0
+
+def invalidate_price_cache(doc=None, method=None, *args):
+    """
+    Drop cached POS prices when an Item Price changes, or an Item or Price List is renamed.
+    Also hooked to Price List on_update / on_trash
+    """
+    if doc and doc.doctype == "Item Price":
+        # Prices are cached per item, including fallbacks from other lists
+        previous = doc.get_doc_before_save()
+        for item_code in {doc.item_code, previous and previous.item_code}:
+            if item_code:
+                frappe.cache().delete_value(f"pos_price:{get_cache_generation('pos_price')}:{item_code}")
+    else:
+        # A renamed item moves its Item Prices without their hooks running, and enabling,
+        # disabling or renaming a list changes the fallback for every item
+        bump_cache_generation("pos_price")
+
+def get_default_warehouse():
+    """Stock Settings default warehouse, cached in redis and read once per request"""
+    return get_request_cached("default_warehouse", get_cached_default_warehouse)
+
+def get_cached_default_warehouse():
+    # Stored as "" when unset so an empty setting is cached too
+    warehouse = frappe.cache().get_value("pos_default_warehouse")
+    if warehouse is None:
+        warehouse = frappe.db.get_single_value("Stock Settings", "default_warehouse") or ""
+        frappe.cache().set_value("pos_default_warehouse", warehouse, expires_in_sec=3600)
+    return warehouse or None
+
+def clear_default_warehouse_cache(doc=None, method=None):
+    """doc_events hook: drop the cached default warehouse"""
+    frappe.cache().delete_value("pos_default_warehouse")
+
 @frappe.whitelist()
 def get_item_stock_qty(item_code, warehouse=None):
     """Get current stock quantity for item"""
     try:
         if not warehouse:
             # Get default warehouse
-            warehouse = frappe.get_value("Stock Settings", None, "default_warehouse")
+            warehouse = get_default_warehouse()
         
         if warehouse:
             stock_qty = frappe.get_value("Bin", {
@@ -722,22 +1045,167 @@ def get_fence_item_metadata(item_code):
         frappe.log_error(f"Error getting metadata for {item_code}: {str(e)}")
         return {}
 
+def get_price_list_preference(price_list):
+    """Requested list first, then the other enabled lists (cached until a Price List changes)"""
+    preferred = [price_list] if price_list else []
+    return preferred + [pl.name for pl in get_pos_price_lists() if pl.name != price_list]
+
+def price_list_rank_sql(price_lists, params):
+    """Bind price_lists into params and return FIELD(price_list, ...) ranking rows in that order"""
+    params["price_lists"] = tuple(price_lists)
+    params.update({f"pl{i}": name for i, name in enumerate(price_lists)})
+    return "FIELD(price_list, {})".format(", ".join(f"%(pl{i})s" for i in range(len(price_lists))))
+
+def get_pos_item_enrichment(item_codes, price_list=None):
+    """
+    Attributes, prices and stock for a page of POS items in a single round trip.
+    Returns (attributes, prices, stock_qtys) shaped like get_item_attributes_map,
+    get_item_prices_for_pos and get_item_stock_qtys.
+    """
+    attributes, prices, stock_qtys = defaultdict(dict), {}, {}
+    if not item_codes:
+        return attributes, prices, stock_qtys
+    
+    try:
+        params = {"item_codes": tuple(item_codes)}
+        branches = ["""
+            SELECT 'attr' as kind, parent as item_code, attribute as detail, attribute_value as value
+            FROM `tabItem Variant Attribute`
+            WHERE parent IN %(item_codes)s
+        """]
+        
+        if price_list:
+            # detail carries the price list's preference rank, lowest wins
+            price_lists = get_price_list_preference(price_list)
+            branches.append(f"""
+                SELECT 'price', item_code, {price_list_rank_sql(price_lists, params)}, price_list_rate
+                FROM `tabItem Price`
+                WHERE item_code IN %(item_codes)s
+                    AND price_list IN %(price_lists)s
+                    AND price_list_rate > 0
+            """)
+        
+        warehouse = get_default_warehouse()
+        if warehouse:
+            params["warehouse"] = warehouse
+            branches.append("""
+                SELECT 'stock', item_code, NULL, SUM(actual_qty)
+                FROM `tabBin`
+                WHERE warehouse = %(warehouse)s AND item_code IN %(item_codes)s
+                GROUP BY item_code
+            """)
+        
+        price_ranks = {}
+        for kind, item_code, detail, value in frappe.db.sql(" UNION ALL ".join(branches), params):
+            if kind == "attr":
+                attributes[item_code][detail] = value
+            elif kind == "price":
+                rank = cint(detail)
+                if rank < price_ranks.get(item_code, len(price_lists) + 1):
+                    price_ranks[item_code] = rank
+                    prices[item_code] = float(value)
+            else:
+                stock_qtys[item_code] = float(value or 0)
+        
+    except Exception as e:
+        frappe.log_error(f"Error enriching {len(item_codes)} POS items: {str(e)}")
+    
+    return attributes, prices, stock_qtys
+
+def get_item_prices_for_pos(item_codes, price_list):
+    """
+    Batch version of get_item_price_for_pos - returns {item_code: rate} for all item_codes.
+    Items without a rate in price_list fall back to the other enabled price lists.
+    """
+    if not item_codes or not price_list:
+        return {}
+    
+    try:
+        params = {"item_codes": tuple(item_codes)}
+        rank_sql = price_list_rank_sql(get_price_list_preference(price_list), params)
+        
+        # Smart fallback in the same query: rows come back in price list preference order
+        prices = {}
+        for item_code, rate in frappe.db.sql(f"""
+            SELECT item_code, price_list_rate
+            FROM `tabItem Price`
+            WHERE item_code IN %(item_codes)s
+                AND price_list IN %(price_lists)s
+                AND price_list_rate > 0
+            ORDER BY {rank_sql}
+        """, params):
+            prices.setdefault(item_code, float(rate))
+        
+        return prices
+        
+    except Exception as e:
+        frappe.log_error(f"Error getting prices for {len(item_codes)} items: {str(e)}")
+        return {}
+
+def get_item_stock_qtys(item_codes, warehouse=None):
+    """Batch version of get_item_stock_qty - returns {item_code: qty} for all item_codes"""
+    if not item_codes:
+        return {}
+    
+    try:
+        if not warehouse:
+            warehouse = get_default_warehouse()
+        
+        if not warehouse:
+            return {}
+        
+        return {
+            item_code: float(qty or 0)
+            for item_code, qty in frappe.db.sql("""
+                SELECT item_code, SUM(actual_qty)
+                FROM `tabBin`
+                WHERE warehouse = %s AND item_code IN %s
+                GROUP BY item_code
+            """, (warehouse, tuple(item_codes)))
+        }
+        
+    except Exception as e:
+        frappe.log_error(f"Error getting stock for {len(item_codes)} items: {str(e)}")
+        return {}
+
+def get_item_attributes_map(item_codes):
+    """Returns {item_code: {attribute: attribute_value}} for all item_codes in one query"""
+    attributes = defaultdict(dict)
+    if not item_codes:
+        return attributes
+    
+    for parent, attribute, attribute_value in frappe.db.sql("""
+        SELECT parent, attribute, attribute_value
+        FROM `tabItem Variant Attribute`
+        WHERE parent IN %s
+    """, (tuple(item_codes),)):
+        attributes[parent][attribute] = attribute_value
+    
+    return attributes
+
+def get_fence_items_metadata(items):
+    """Batch version of get_fence_item_metadata - returns {item_code: metadata} for item rows"""
+    if not items:
+        return {}
+    
+    try:
+        metadata = get_item_attributes_map([item.name for item in items])
+        
+        # Add component type classification
+        for item in items:
+            if item.item_name:
+                metadata[item.name]["component_type"] = classify_fence_component(item.item_name)
+        
+        return dict(metadata)
+        
+    except Exception as e:
+        frappe.log_error(f"Error getting metadata for {len(items)} items: {str(e)}")
+        return {}
+
 def classify_fence_component(item_name):
     """Classify fence component type based on name"""
-    item_lower = item_name.lower()
-    
-    if "panel" in item_lower:
-        return "panels"
-    elif "post" in item_lower:
-        return "posts"
-    elif "gate" in item_lower:
-        return "gates"
-    elif "cap" in item_lower:
-        return "caps"
-    elif any(word in item_lower for word in ["hinge", "latch", "hardware", "bracket"]):
-        return "hardware"
-    else:
-        return "other"
+    match = _COMPONENT_RE.match(item_name or "")
+    return match.lastgroup if match else "other"
 
 @frappe.whitelist()
 def add_fence_item_to_cart(item_code, qty=1, customer=None, price_list=None):
@@ -760,61 +1228,59 @@ def add_fence_item_to_cart(item_code, qty=1, customer=None, price_list=None):
         frappe.log_error(f"Error adding {item_code} to cart: {str(e)}")
         return {"message": "Failed to add item to cart"}
 
+def unwrap_cart_quotation(cart_response):
+    """Pull the quotation and its name out of whatever shape get_cart_quotation returned"""
+    quotation_doc = getattr(cart_response, "doc", None)
+    if quotation_doc is None and isinstance(cart_response, dict):
+        quotation_doc = cart_response.get("doc")
+        if quotation_doc is None and "message" in cart_response:
+            # Sometimes the response is wrapped in a message
+            message = cart_response["message"]
+            quotation_doc = message.get("doc", message) if isinstance(message, dict) else message
+    
+    quotation_name = getattr(quotation_doc, "name", None)
+    if quotation_name is None and isinstance(quotation_doc, dict):
+        quotation_name = quotation_doc.get("name")
+    
+    return quotation_doc, quotation_name
+
 @frappe.whitelist()
 def update_cart_pricing(price_list):
     """Update cart pricing based on price list"""
     try:
-        print(f"🏷️ POS API: Updating cart pricing to {price_list}")
+        logger.debug("🏷️ POS API: Updating cart pricing to %s", price_list)
         
         # Get cart quotation with better error handling
         cart_response = cart.get_cart_quotation()
-        print(f"🔍 POS API: Cart response: {cart_response}")
+        logger.debug("🔍 POS API: Cart response: %s", cart_response)
         
         if not cart_response:
-            print("❌ POS API: No cart response received")
+            logger.info("POS API: No cart response received")
             return {"message": "No cart found - please add items to cart first"}
         
-        # Handle different response formats
-        quotation_doc = None
-        if hasattr(cart_response, 'doc'):
-            quotation_doc = cart_response.doc
-        elif isinstance(cart_response, dict) and 'doc' in cart_response:
-            quotation_doc = cart_response['doc']
-        elif isinstance(cart_response, dict) and 'message' in cart_response:
-            # Sometimes the response is wrapped in a message
-            if isinstance(cart_response['message'], dict) and 'doc' in cart_response['message']:
-                quotation_doc = cart_response['message']['doc']
-            else:
-                quotation_doc = cart_response['message']
+        quotation_doc, quotation_name = unwrap_cart_quotation(cart_response)
         
         if not quotation_doc:
-            print("❌ POS API: No quotation document found in response")
+            logger.info("POS API: No quotation document found in response")
             return {"message": "No cart found - please add items to cart first"}
         
-        # Get quotation name
-        quotation_name = None
-        if hasattr(quotation_doc, 'name'):
-            quotation_name = quotation_doc.name
-        elif isinstance(quotation_doc, dict) and 'name' in quotation_doc:
-            quotation_name = quotation_doc['name']
-        
         if not quotation_name:
-            print("❌ POS API: No quotation name found")
+            logger.warning("⚠️ POS API: No quotation name found")
             return {"message": "Invalid cart document - no quotation name"}
         
-        print(f"📋 POS API: Found cart {quotation_name}")
+        logger.debug("📋 POS API: Found cart %s", quotation_name)
         
         # Get the quotation document
         try:
             doc = frappe.get_doc("Quotation", quotation_name)
         except Exception as e:
-            print(f"❌ POS API: Error getting quotation {quotation_name}: {str(e)}")
+            logger.error("❌ POS API: Error getting quotation %s: %s", quotation_name, e)
             return {"message": f"Cart not found: {str(e)}"}
         
         # Force update price list - this is critical for POS
         old_price_list = doc.selling_price_list
         doc.selling_price_list = price_list
-        print(f"🔄 POS API: Price list changed from {old_price_list} to {price_list}")
+        logger.debug("🔄 POS API: Price list changed from %s to %s", old_price_list, price_list)
         
         # Reset pricing rule effects to prevent incremental increases
         doc.ignore_pricing_rule = 1  # Temporarily ignore pricing rules
@@ -822,96 +1288,88 @@ def update_cart_pricing(price_list):
         doc.additional_discount_percentage = 0
         doc.coupon_code = ""
         
-        print(f"🔄 POS API: Updating {len(doc.items)} items to price list {price_list}")
+        logger.debug("🔄 POS API: Updating %s items to price list %s", len(doc.items), price_list)
+        
+        # One batched price lookup for the whole cart instead of a query per row
+        prices = get_item_prices_for_pos([item.item_code for item in doc.items], price_list)
         
-        # Recalculate prices and update quantities to trigger price refresh
         for item in doc.items:
             old_rate = item.rate
-            new_rate = get_item_price_for_pos(item.item_code, price_list)
+            new_rate = prices.get(item.item_code)
             if new_rate:
                 item.rate = new_rate
                 item.amount = new_rate * item.qty
                 # Reset any pricing rule effects on the item
                 item.discount_percentage = 0
                 item.discount_amount = 0
-                print(f"💰 POS API: {item.item_code}: {old_rate} → {new_rate}")
+                logger.debug("💰 POS API: %s: %s → %s", item.item_code, old_rate, new_rate)
             else:
                 # If no price found, keep existing rate or set to 0
-                print(f"⚠️ POS API: No price found for {item.item_code} in {price_list}, keeping rate {old_rate}")
+                logger.debug("⚠️ POS API: No price found for %s in %s, keeping rate %s", item.item_code, price_list, old_rate)
         
-        # Recalculate taxes and totals only once
-        doc.run_method("calculate_taxes_and_totals")
-        
-        # Force save with ignore_permissions to ensure price list change is saved
+        # save() validates the new rates, recalculates taxes and totals once
+        # and bumps modified so concurrent cart edits are still detected.
+        # ignore_permissions: website and POS users may not have Quotation write access
         doc.flags.ignore_permissions = True
         doc.save()
         
-        print(f"✅ POS API: Cart pricing updated successfully to {price_list}")
+        logger.debug("✅ POS API: Cart pricing updated successfully to %s", price_list)
         return {"message": "Cart pricing updated successfully"}
         
     except Exception as e:
-        print(f"❌ POS API Error: {str(e)}")
         frappe.log_error(f"Error updating cart pricing: {str(e)}")
-        import traceback
-        traceback.print_exc()
         return {"message": f"Failed to update pricing: {str(e)}"}
 
 @frappe.whitelist()
 def set_cart_price_list(price_list):
     """Set the cart price list from POS - overrides customer default"""
     try:
-        print(f"🏷️ POS API: Setting cart price list to {price_list}")
+        logger.debug("🏷️ POS API: Setting cart price list to %s", price_list)
         
         # Get or create cart quotation
         cart_response = cart.get_cart_quotation()
         
         if not cart_response:
-            print("❌ POS API: No cart response received")
+            logger.info("POS API: No cart response received")
             return {"message": "No cart found"}
         
-        # Handle different response formats
-        quotation_doc = None
-        if hasattr(cart_response, 'doc'):
-            quotation_doc = cart_response.doc
-        elif isinstance(cart_response, dict) and 'doc' in cart_response:
-            quotation_doc = cart_response['doc']
-        elif isinstance(cart_response, dict) and 'message' in cart_response:
-            if isinstance(cart_response['message'], dict) and 'doc' in cart_response['message']:
-                quotation_doc = cart_response['message']['doc']
-            else:
-                quotation_doc = cart_response['message']
+        quotation_doc, quotation_name = unwrap_cart_quotation(cart_response)
         
         if not quotation_doc:
-            print("❌ POS API: No quotation document found in response")
+            logger.info("POS API: No quotation document found in response")
             return {"message": "No cart found"}
         
-        # Get quotation name
-        quotation_name = None
-        if hasattr(quotation_doc, 'name'):
-            quotation_name = quotation_doc.name
-        elif isinstance(quotation_doc, dict) and 'name' in quotation_doc:
-            quotation_name = quotation_doc['name']
-        
         # Check if this is a local document (not yet saved)
         is_local = False
         if isinstance(quotation_doc, dict) and quotation_doc.get('__islocal'):
             is_local = True
-            print(f"📋 POS API: Cart is local document (not yet saved)")
+            logger.debug("📋 POS API: Cart is local document (not yet saved)")
         elif not quotation_name:
-            print("❌ POS API: No quotation name found")
+            logger.warning("⚠️ POS API: No quotation name found")
             return {"message": "Invalid cart document - no quotation name"}
         
         if is_local:
             # For local documents, work directly with the quotation_doc
             doc = quotation_doc
-            print(f"📋 POS API: Working with local cart document")
+            logger.debug("📋 POS API: Working with local cart document")
+        elif not quotation_doc.get("items"):
+            # Nothing to reprice, so only the header changes and a full save() is overhead
+            frappe.db.set_value("Quotation", quotation_name, {
+                "selling_price_list": price_list,
+                "ignore_pricing_rule": 1,
+                "discount_amount": 0,
+                "additional_discount_percentage": 0,
+                "coupon_code": "",
+            }, update_modified=False)
+            logger.debug("✅ POS API: Empty cart price list set to %s", price_list)
+            return {"message": f"Cart price list set to {price_list}"}
         else:
-            print(f"📋 POS API: Setting price list for cart {quotation_name}")
+            logger.debug("📋 POS API: Setting price list for cart %s", quotation_name)
             # Get the quotation document
             try:
                 doc = frappe.get_doc("Quotation", quotation_name)
             except Exception as e:
-                print(f"❌ POS API: Error getting quotation {quotation_name}: {str(e)}")
+                logger.error("❌ POS API: Error getting quotation %s: %s", quotation_name, e)
                 return {"message": f"Cart not found: {str(e)}"}
         
         # Set the price list
@@ -925,16 +1383,17 @@ def set_cart_price_list(price_list):
         
         # If there are items, recalculate their prices
         if doc.items:
-            print(f"🔄 POS API: Recalculating prices for {len(doc.items)} items")
+            logger.debug("🔄 POS API: Recalculating prices for %s items", len(doc.items))
+            prices = get_item_prices_for_pos([item.item_code for item in doc.items], price_list)
             for item in doc.items:
-                new_rate = get_item_price_for_pos(item.item_code, price_list)
+                new_rate = prices.get(item.item_code)
                 if new_rate:
                     item.rate = new_rate
                     item.amount = new_rate * item.qty
                     # Reset any pricing rule effects on the item
                     item.discount_percentage = 0
                     item.discount_amount = 0
-                    print(f"💰 POS API: {item.item_code}: {item.rate}")
+                    logger.debug("💰 POS API: %s: %s", item.item_code, item.rate)
         
         # Recalculate taxes and totals only once
         if hasattr(doc, 'run_method'):
@@ -944,15 +1403,14 @@ def set_cart_price_list(price_list):
         if is_local:
             # For local documents, we can't save them directly
             # The cart system will handle saving when items are added
-            print(f"📋 POS API: Local cart updated with price list {price_list}")
+            logger.debug("📋 POS API: Local cart updated with price list %s", price_list)
         else:
             doc.save()
-            print(f"✅ POS API: Cart price list set to {price_list}")
+            logger.debug("✅ POS API: Cart price list set to %s", price_list)
         
         return {"message": f"Cart price list set to {price_list}"}
         
     except Exception as e:
-        print(f"❌ POS API Error: {str(e)}")
         frappe.log_error(f"Error setting cart price list: {str(e)}")
         return {"message": f"Failed to set price list: {str(e)}"}
 
@@ -960,61 +1418,56 @@ def set_cart_price_list(price_list):
 def add_item_to_cart_with_price_list(item_code, qty=1, price_list=None):
     """Add item to cart with specific price list - overrides customer default"""
     try:
-        print(f"🛒 POS API: Adding {item_code} (qty: {qty}) with price list: {price_list}")
+        logger.debug("🛒 POS API: Adding %s (qty: %s) with price list: %s", item_code, qty, price_list)
         
         # Use POS-specific cart creation that respects the price list from the beginning
         result = create_pos_cart_with_price_list(item_code, qty, price_list)
         
-        print(f"✅ POS API: Successfully added {item_code} to cart with price list {price_list}")
+        logger.debug("✅ POS API: Successfully added %s to cart with price list %s", item_code, price_list)
         return result
         
     except Exception as e:
-        print(f"❌ POS API Error: {str(e)}")
         frappe.log_error(f"Error adding item to cart with price list: {str(e)}")
         return {"message": f"Failed to add item to cart: {str(e)}"}
 
+def get_website_warehouse(item_code):
+    """Website Item warehouse for an item, looked up once per request"""
+    return get_request_cached(f"website_warehouse:{item_code}", lambda: frappe.get_cached_value(
+        "Website Item", {"item_code": item_code}, "website_warehouse"
+    ))
+
 @frappe.whitelist()
 def create_pos_cart_with_price_list(item_code, qty=1, price_list=None):
     """Create or update cart with POS-specific price list from the beginning"""
     try:
-        print(f"🏗️ POS API: Creating cart with price list: {price_list}")
+        logger.debug("🏗️ POS API: Creating cart with price list: %s", price_list)
         
         # Get or create cart quotation
         cart_response = cart.get_cart_quotation()
         
         if not cart_response:
-            print("❌ POS API: No cart response received")
+            logger.info("POS API: No cart response received")
             return {"message": "Failed to get cart"}
         
-        # Handle different response formats to get the quotation document
-        quotation_doc = None
-        if hasattr(cart_response, 'doc'):
-            quotation_doc = cart_response.doc
-        elif isinstance(cart_response, dict) and 'doc' in cart_response:
-            quotation_doc = cart_response['doc']
-        elif isinstance(cart_response, dict) and 'message' in cart_response:
-            if isinstance(cart_response['message'], dict) and 'doc' in cart_response['message']:
-                quotation_doc = cart_response['message']['doc']
-            else:
-                quotation_doc = cart_response['message']
+        quotation_doc, _ = unwrap_cart_quotation(cart_response)
         
         if not quotation_doc:
-            print("❌ POS API: No quotation document found in response")
+            logger.info("POS API: No quotation document found in response")
             return {"message": "Failed to get cart document"}
         
         # Check if this is a local document (not yet saved)
         is_local = False
         if isinstance(quotation_doc, dict) and quotation_doc.get('__islocal'):
             is_local = True
-            print(f"📋 POS API: Working with local cart document")
+            logger.debug("📋 POS API: Working with local cart document")
         else:
-            print(f"📋 POS API: Working with saved cart document")
+            logger.debug("📋 POS API: Working with saved cart document")
         
         # Set the price list BEFORE adding the item
         if price_list:
             old_price_list = quotation_doc.selling_price_list
             quotation_doc.selling_price_list = price_list
-            print(f"🏷️ POS API: Price list set from {old_price_list} to {price_list}")
+            logger.debug("🏷️ POS API: Price list set from %s to %s", old_price_list, price_list)
         
         # Now add the item to the cart
         # Check if item already exists in cart
@@ -1028,12 +1481,10 @@ def create_pos_cart_with_price_list(item_code, qty=1, price_list=None):
         if existing_item:
             # Set existing item quantity to the new value (not add to it)
             existing_item.qty = float(qty)
-            print(f"🔄 POS API: Set existing item {item_code} quantity to {existing_item.qty}")
+            logger.debug("🔄 POS API: Set existing item %s quantity to %s", item_code, existing_item.qty)
         else:
             # Add new item to cart
-            warehouse = frappe.get_cached_value(
-                "Website Item", {"item_code": item_code}, "website_warehouse"
-            )
+            warehouse = get_website_warehouse(item_code)
             
             new_item = {
                 "doctype": "Quotation Item",
@@ -1050,7 +1501,7 @@ def create_pos_cart_with_price_list(item_code, qty=1, price_list=None):
                     quotation_doc.items = []
                 quotation_doc.items.append(new_item)
             
-            print(f"➕ POS API: Added new item {item_code} with quantity {qty}")
+            logger.debug("➕ POS API: Added new item %s with quantity %s", item_code, qty)
         
         # Apply cart settings to recalculate prices and totals
         if hasattr(quotation_doc, 'run_method'):
@@ -1061,11 +1512,10 @@ def create_pos_cart_with_price_list(item_code, qty=1, price_list=None):
         quotation_doc.flags.ignore_permissions = True
         quotation_doc.save()
         
-        print(f"✅ POS API: Cart created/updated with price list {price_list}")
+        logger.debug("✅ POS API: Cart created/updated with price list %s", price_list)
         return {"message": "Item added to cart successfully", "quotation": quotation_doc.name if hasattr(quotation_doc, 'name') else None}
         
     except Exception as e:
-        print(f"❌ POS API Error: {str(e)}")
         frappe.log_error(f"Error creating POS cart with price list: {str(e)}")
         return {"message": f"Failed to create cart: {str(e)}"}
 
@@ -1081,8 +1531,8 @@ def create_pos_order(order_type="quote", delivery_method=None, scheduled_date=No
         doc = frappe.get_doc("Quotation", quotation.name)
         
         # Add POS-specific fields
-        if hasattr(doc, 'order_type'):
-            doc.order_type = order_type
+        if hasattr(doc, 'pos_order_type'):
+            doc.pos_order_type = "Order" if order_type == "order" else "Quote"
         if hasattr(doc, 'delivery_method') and delivery_method:
             doc.delivery_method = delivery_method
         if hasattr(doc, 'scheduled_date') and scheduled_date:
@@ -1099,10 +1549,12 @@ def create_pos_order(order_type="quote", delivery_method=None, scheduled_date=No
         # Convert to Sales Order if order type is "order"
         if order_type == "order":
             sales_order = convert_quotation_to_sales_order_enhanced(doc.name)
+            if not sales_order:
+                return {"message": "Failed to create order", "quotation": doc.name}
             return {
                 "message": "Order created successfully",
                 "quotation": doc.name,
-                "sales_order": sales_order.name if sales_order else None,
+                "sales_order": sales_order.name,
                 "order_type": order_type
             }
         else:
@@ -1114,119 +1566,44 @@ def create_pos_order(order_type="quote", delivery_method=None, scheduled_date=No
             
     except Exception as e:
         frappe.log_error(f"Error creating POS order: {str(e)}")
-        return {"message": "Failed to create order"}
-
-def convert_quotation_to_sales_order_enhanced(quotation_name, submit_order=True):
-    """Convert quotation to sales order with enhanced tax and shipping preservation"""
-    try:
-        quotation = frappe.get_doc("Quotation", quotation_name)
-        
-        # Create Sales Order
-        sales_order = frappe.get_doc({
-            "doctype": "Sales Order",
-            "customer": quotation.customer,
-            "quotation_to": "Customer",
-            "order_type": "Sales",
-            "delivery_date": quotation.get("scheduled_date") or frappe.utils.add_days(frappe.utils.today(), 7),
-            "selling_price_list": quotation.selling_price_list,
-            "currency": quotation.currency,
-            "taxes_and_charges": quotation.taxes_and_charges,  # Copy tax template
-            "items": []
-        })
-        
-        frappe.log_error(f"DEBUG: Sales Order created with tax template: {sales_order.taxes_and_charges}", "Sales Order Tax Debug")
-        
-        # Copy items from quotation
-        for item in quotation.items:
-            sales_order.append("items", {
-                "item_code": item.item_code,
-                "item_name": item.item_name,
-                "description": item.description,
-                "qty": item.qty,
-                "uom": item.uom,
-                "rate": item.rate,
-                "amount": item.amount
-            })
-        
-        # Store quotation taxes for restoration after calculate_taxes_and_totals
-        frappe.log_error(f"Quotation {quotation_name} has {len(quotation.taxes) if hasattr(quotation, 'taxes') and quotation.taxes else 0} taxes", "SO Tax Debug")
-        frappe.log_error(f"Tax template: {getattr(quotation, 'taxes_and_charges', 'None')}", "SO Tax Debug")
-        
-        # Store quotation taxes for later restoration
-        quotation_taxes = []
-        if hasattr(quotation, 'taxes') and quotation.taxes:
-            for tax in quotation.taxes:
-                quotation_taxes.append({
-                    "charge_type": tax.charge_type,
-                    "account_head": tax.account_head,
-                    "description": tax.description,
-                    "rate": getattr(tax, 'rate', None),
-                    "tax_amount": getattr(tax, 'tax_amount', None),
-                    "total": getattr(tax, 'total', None),
-                    "cost_center": getattr(tax, 'cost_center', None),
-                    "included_in_print_rate": getattr(tax, 'included_in_print_rate', 0),
-                    "included_in_paid_amount": getattr(tax, 'included_in_paid_amount', 0)
-                })
-        
-        # Copy POS-specific fields
-        if hasattr(quotation, 'delivery_method'):
-            sales_order.delivery_method = quotation.delivery_method
-        if hasattr(quotation, 'scheduled_date'):
-            sales_order.delivery_date = quotation.scheduled_date
-        if hasattr(quotation, 'scheduled_time'):
-            sales_order.scheduled_time = quotation.scheduled_time
-        
-        # DON'T call calculate_taxes_and_totals first - it clears manually copied taxes
-        # Instead, directly restore quotation taxes and then calculate once
-        
-        frappe.log_error(f"SO before tax restore: {len(sales_order.taxes)} taxes", "SO Tax Debug")
-        
-        # Restore quotation taxes (including shipping) directly
-        if quotation_taxes:
-            frappe.log_error(f"Restoring {len(quotation_taxes)} taxes to SO", "SO Tax Debug")
-            
-            # Clear and restore all taxes from quotation
-            sales_order.set("taxes", [])
-            for tax_data in quotation_taxes:
-                # Only add fields that have values
-                clean_tax = {"charge_type": tax_data["charge_type"], "account_head": tax_data["account_head"], "description": tax_data["description"]}
-                if tax_data.get("rate"):
-                    clean_tax["rate"] = tax_data["rate"]
-                if tax_data.get("tax_amount"):
-                    clean_tax["tax_amount"] = tax_data["tax_amount"]
-                if tax_data.get("total"):
-                    clean_tax["total"] = tax_data["total"]
-                if tax_data.get("cost_center"):
-                    clean_tax["cost_center"] = tax_data["cost_center"]
-                if tax_data.get("included_in_print_rate") is not None:
-                    clean_tax["included_in_print_rate"] = tax_data["included_in_print_rate"]
-                if tax_data.get("included_in_paid_amount") is not None:
-                    clean_tax["included_in_paid_amount"] = tax_data["included_in_paid_amount"]
-                    
-                sales_order.append("taxes", clean_tax)
-            
-            frappe.log_error(f"SO after tax restore: {len(sales_order.taxes)} taxes", "SO Tax Debug")
-            
-            # Single final calculation to update totals
-            sales_order.run_method("calculate_taxes_and_totals")
-            frappe.log_error(f"SO after final calc: {len(sales_order.taxes)} taxes", "SO Tax Debug")
-        else:
-            # No quotation taxes, use standard calculation
-            sales_order.run_method("calculate_taxes_and_totals")
-        
+        return {"message": "Failed to create order"}
+
+def convert_quotation_to_sales_order_enhanced(quotation_name, submit_order=True):
+    """Convert quotation to sales order with enhanced tax and shipping preservation"""
+    from erpnext.selling.doctype.quotation.quotation import make_sales_order
+    
+    # Submitting the draft cart and creating the order succeed or fail together,
+    # so a failed conversion never leaves a submitted quotation behind
+    frappe.db.savepoint("pos_sales_order")
+    try:
+        # The mapper only converts submitted quotations; POS carts are still drafts here
+        if frappe.db.get_value("Quotation", quotation_name, "docstatus") == 0:
+            quotation = frappe.get_doc("Quotation", quotation_name)
+            quotation.flags.ignore_permissions = True
+            quotation.submit()
+        
+        # ERPNext's mapper copies items, taxes (shipping included), matching POS fields
+        # and prevdoc links in one pass
+        sales_order = make_sales_order(quotation_name)
+        
+        scheduled_date = frappe.db.get_value("Quotation", quotation_name, "scheduled_date") \
+            if frappe.db.has_column("Quotation", "scheduled_date") else None
+        sales_order.delivery_date = scheduled_date or frappe.utils.add_days(frappe.utils.today(), 7)
+        for item in sales_order.items:
+            item.delivery_date = item.delivery_date or sales_order.delivery_date
+        
+        # insert() validates the order, which recalculates taxes and totals once
+        sales_order.flags.ignore_permissions = True
         sales_order.insert()
-        frappe.log_error(f"SO {sales_order.name} created with {len(sales_order.taxes)} taxes", "SO Tax Debug")
         
+        # Submitting marks the quotation as Ordered through the mapped prevdoc links
         if submit_order:
             sales_order.submit()
-            
-            # Update quotation status
-            quotation.status = "Ordered"
-            quotation.save()
         
         return sales_order
         
     except Exception as e:
+        frappe.db.rollback(save_point="pos_sales_order")
         frappe.log_error(f"Error converting quotation to sales order: {str(e)}")
         return None
 
@@ -1234,45 +1611,57 @@ def convert_quotation_to_sales_order_enhanced(quotation_name, submit_order=True)
 def get_fence_categories():
     """Get fence categories/item groups for POS"""
     try:
-        # First try to get fence-specific categories
-        fence_categories = frappe.get_all("Item Group", 
-            filters={
-                "parent_item_group": ["in", ["Fence Products", "Fencing"]],
-                "is_group": 0
-            },
-            fields=["name", "item_group_name", "image", "parent_item_group"]
-        )
-        
-        # If no fence categories, get all item groups
-        if not fence_categories:
-            fence_categories = frappe.get_all("Item Group",
-                filters={"is_group": 0},
-                fields=["name", "item_group_name", "image", "parent_item_group"],
-                limit=10
-            )
-        
-        return fence_categories
+        return get_request_cached("fence_categories", lambda: frappe.cache().hget(
+            "pos_api", "fence_categories", generator=build_fence_categories
+        ))
         
     except Exception as e:
         frappe.log_error(f"Error getting fence categories: {str(e)}")
         return []
 
+def build_fence_categories():
+    """Query fence categories - cached by get_fence_categories until an Item Group changes"""
+    # Fence-specific categories, or the first 10 leaf groups when there are none
+    fence_parents = ("Fence Products", "Fencing")
+    fence_categories = frappe.db.sql("""
+        SELECT name, item_group_name, image, parent_item_group, modified
+        FROM `tabItem Group`
+        WHERE is_group = 0 AND parent_item_group IN %(fence_parents)s
+        UNION ALL
+        (
+            SELECT name, item_group_name, image, parent_item_group, modified
+            FROM `tabItem Group`
+            WHERE is_group = 0
+            AND NOT EXISTS (
+                SELECT 1 FROM `tabItem Group`
+                WHERE is_group = 0 AND parent_item_group IN %(fence_parents)s
+            )
+            ORDER BY modified DESC
+            LIMIT 10
+        )
+        ORDER BY modified DESC
+    """, {"fence_parents": fence_parents}, as_dict=True)
+    
+    for category in fence_categories:
+        del category["modified"]
+    
+    return fence_categories
+
 @frappe.whitelist()
-def get_pos_customers(search_term=""):
+def get_pos_customers(search_term="", start=0, page_length=20):
     """Get customers for POS with search"""
     try:
-        filters = {}
-        if search_term:
-            filters = {
-                "customer_name": ["like", f"%{search_term}%"]
-            }
-        
-        customers = frappe.get_all("Customer",
-            filters=filters,
-            fields=["name", "customer_name", "customer_group", "mobile_no", "email_id"],
-            limit=20,
-            order_by="customer_name"
-        )
+        start = max(cint(start), 0)
+        page_length = max(1, min(cint(page_length) or 20, 100))
+        
+        # The POS refreshes this list on every focus, so pages are cached briefly.
+        # get_all applies the user's permissions, so the cache is kept per user
+        term_hash = hashlib.md5((search_term or "").encode()).hexdigest()
+        cache_key = f"pos_customers:{frappe.session.user}:{start}:{page_length}:{term_hash}"
+        customers = frappe.cache().get_value(cache_key)
+        if customers is None:
+            customers = build_pos_customers(search_term, start, page_length)
+            frappe.cache().set_value(cache_key, customers, expires_in_sec=300)
         
         return customers
         
@@ -1280,26 +1669,55 @@ def get_pos_customers(search_term=""):
         frappe.log_error(f"Error getting customers: {str(e)}")
         return []
 
+def build_pos_customers(search_term, start, page_length):
+    """Query one page of customers - cached by get_pos_customers until a Customer changes"""
+    filters = {}
+    if search_term:
+        filters = {
+            "customer_name": ["like", f"%{escape_like(search_term)}%"]
+        }
+    
+    return frappe.get_all("Customer",
+        filters=filters,
+        fields=["name", "customer_name", "customer_group", "mobile_no", "email_id"],
+        limit_start=start,
+        limit_page_length=page_length,
+        order_by="customer_name"
+    )
+
+def clear_pos_customers_cache(doc=None, method=None):
+    """doc_events hook: drop the cached POS customer pages"""
+    frappe.cache().delete_keys("pos_customers:")
+
 @frappe.whitelist()
 def get_pos_price_lists():
     """Get available price lists for POS"""
     try:
-        price_lists = frappe.get_all("Price List",
-            filters={"enabled": 1},
-            fields=["name", "price_list_name", "currency"],
-            order_by="price_list_name"
-        )
-        
-        return price_lists
+        return get_request_cached("price_lists", lambda: frappe.cache().hget(
+            "pos_api", "price_lists", generator=build_pos_price_lists
+        ))
         
     except Exception as e:
         frappe.log_error(f"Error getting price lists: {str(e)}")
         return []
 
+def build_pos_price_lists():
+    """Query enabled price lists - cached by get_pos_price_lists until a Price List changes"""
+    return frappe.get_all("Price List",
+        filters={"enabled": 1},
+        fields=["name", "price_list_name", "currency"],
+        order_by="price_list_name"
+    )
+
 @frappe.whitelist()
 def setup_fence_pos_data():
     """Setup initial data for fence POS system"""
     try:
+        # Add custom fields for POS functionality. Their ALTER TABLE commits implicitly,
+        # so this step runs and is committed on its own before the data below
+        setup_pos_custom_fields()
+        frappe.db.commit()
+        
         # Create fence item groups if they don't exist
         setup_fence_item_groups()
         
@@ -1309,12 +1727,12 @@ def setup_fence_pos_data():
         # Create fence price lists if they don't exist
         setup_fence_price_lists()
         
-        # Add custom fields for POS functionality
-        setup_pos_custom_fields()
-        
+        # Item groups and price lists are committed together, or rolled back together
+        frappe.db.commit()
         return {"message": "Fence POS data setup completed"}
         
     except Exception as e:
+        frappe.db.rollback()
         frappe.log_error(f"Error setting up fence POS data: {str(e)}")
         return {"message": "Failed to setup fence POS data"}
 
@@ -1327,8 +1745,13 @@ def setup_fence_item_groups():
         {"name": "Pressure Treated Fence", "parent": "Fence Products", "is_group": 0}
     ]
     
+    existing = set(frappe.get_all("Item Group",
+        filters={"name": ["in", [group["name"] for group in fence_groups]]},
+        pluck="name"
+    ))
+    
     for group in fence_groups:
-        if not frappe.db.exists("Item Group", group["name"]):
+        if group["name"] not in existing:
             doc = frappe.get_doc({
                 "doctype": "Item Group",
                 "item_group_name": group["name"],
@@ -1346,8 +1769,13 @@ def setup_fence_attributes():
         {"name": "Component Type", "values": ["Panels", "Posts", "Gates", "Caps", "Hardware"]}
     ]
     
+    existing = set(frappe.get_all("Item Attribute",
+        filters={"name": ["in", [attr["name"] for attr in attributes]]},
+        pluck="name"
+    ))
+    
     for attr in attributes:
-        if not frappe.db.exists("Item Attribute", attr["name"]):
+        if attr["name"] not in existing:
             doc = frappe.get_doc({
                 "doctype": "Item Attribute",
                 "attribute_name": attr["name"],
@@ -1362,8 +1790,13 @@ def setup_fence_price_lists():
         {"name": "Contractor Price List", "currency": "USD"}
     ]
     
+    existing = set(frappe.get_all("Price List",
+        filters={"name": ["in", [price_list["name"] for price_list in price_lists]]},
+        pluck="name"
+    ))
+    
     for price_list in price_lists:
-        if not frappe.db.exists("Price List", price_list["name"]):
+        if price_list["name"] not in existing:
             doc = frappe.get_doc({
                 "doctype": "Price List",
                 "price_list_name": price_list["name"],
@@ -1376,93 +1809,50 @@ def setup_pos_custom_fields():
     """Add custom fields for POS functionality"""
     # Note: custom_material_type and custom_material_class fields are added via Customize Form
     
-    # Add custom_popular field to Item doctype
-    try:
-        if not frappe.db.exists("Custom Field", {"dt": "Item", "fieldname": "custom_popular"}):
-            custom_field = frappe.get_doc({
-                "doctype": "Custom Field",
-                "dt": "Item",
-                "fieldname": "custom_popular",
-                "fieldtype": "Check",
-                "label": "Popular Item",
-                "description": "Mark this item as popular for POS display",
-                "default": "0",
-                "insert_after": "published_in_website",
-                "permlevel": 0
-            })
-            custom_field.insert(ignore_permissions=True)
-            frappe.db.commit()
-            frappe.logger().info("Created custom_popular field in Item doctype")
-    except Exception as e:
-        frappe.log_error(f"Error creating custom_popular field: {str(e)}")
-    
-    # Add fields to Quotation
-    quotation_fields = [
-        {
-            "fieldname": "order_type",
-            "fieldtype": "Select",
-            "options": "Quote\nOrder",
-            "label": "Order Type",
-            "insert_after": "customer"
-        },
-        {
-            "fieldname": "delivery_method",
-            "fieldtype": "Select", 
-            "options": "Pickup\nDelivery",
-            "label": "Delivery Method",
-            "insert_after": "order_type"
-        },
-        {
-            "fieldname": "scheduled_date",
-            "fieldtype": "Date",
-            "label": "Scheduled Date",
-            "insert_after": "delivery_method"
-        },
-        {
-            "fieldname": "scheduled_time",
-            "fieldtype": "Time",
-            "label": "Scheduled Time", 
-            "insert_after": "scheduled_date"
-        }
-    ]
-    
-    for field in quotation_fields:
-        create_custom_field("Quotation", field)
+    # Installed with the app (after_install and the add_pos_custom_fields patch);
+    # this is only a safety net for sites where they are still missing
+    if frappe.db.exists("Custom Field", {"dt": "Quotation", "fieldname": "pos_order_type"}):
+        return
     
-    # Add similar fields to Sales Order
-    for field in quotation_fields:
-        create_custom_field("Sales Order", field)
-
-def create_custom_field(doctype, field_dict):
-    """Create custom field if it doesn't exist"""
-    field_name = f"{doctype}-{field_dict['fieldname']}"
-    
-    if not frappe.db.exists("Custom Field", field_name):
-        custom_field = frappe.get_doc({
-            "doctype": "Custom Field",
-            "name": field_name,
-            "dt": doctype,
-            **field_dict
-        })
-        custom_field.insert(ignore_permissions=True) 
+    add_pos_custom_fields()
 
 @frappe.whitelist()
+@frappe.read_only()
 def debug_pos_items():
     """Debug function to check POS item setup"""
     debug_info = {}
     
     try:
-        # Check if custom_material_type field exists
-        custom_field_exists = frappe.db.sql("SHOW COLUMNS FROM tabItem LIKE 'custom_material_type'")
-        debug_info['custom_field_exists'] = bool(custom_field_exists)
+        # Check if custom_material_type field exists (data dictionary, no metadata lock)
+        custom_field_exists = bool(frappe.db.sql("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+                AND table_name = 'tabItem'
+                AND column_name = 'custom_material_type'
+            LIMIT 1
+        """))
+        debug_info['custom_field_exists'] = custom_field_exists
+        
+        # All counts in one round-trip
+        material_count_column = f""",
+                (SELECT COUNT(*) FROM `tabItem`
+                    WHERE {item_has_material_condition()} AND disabled = 0) as custom_material_count""" \
+            if custom_field_exists else ""
+        counts = frappe.db.sql(f"""
+            SELECT
+                (SELECT COUNT(*) FROM `tabItem` WHERE disabled = 0) as total_items,
+                (SELECT COUNT(*) FROM `tabWebsite Item` WHERE published = 1) as website_items_count,
+                -- drive from the (published, item_code) index on Website Item, then probe Item by primary key
+                (SELECT COUNT(*)
+                    FROM `tabWebsite Item` wi
+                    STRAIGHT_JOIN `tabItem` i ON i.name = wi.item_code
+                    WHERE wi.published = 1 AND i.disabled = 0) as items_with_website_items,
+                (SELECT COUNT(*) FROM `tabItem Group` WHERE is_group = 0) as item_groups_count{material_count_column}
+        """, as_dict=True)[0]
         
         # Count items with custom_material_type
         if custom_field_exists:
-            custom_material_count = frappe.db.count("Item", {
-                "custom_material_type": ["!=", ""],
-                "disabled": 0
-            })
-            debug_info['items_with_custom_material_type'] = custom_material_count
+            debug_info['items_with_custom_material_type'] = counts.custom_material_count
             
             # Get sample items with custom_material_type
             sample_items = frappe.db.get_list("Item", 
@@ -1472,22 +1862,9 @@ def debug_pos_items():
             )
             debug_info['sample_custom_material_items'] = sample_items
         
-        # Count total items
-        total_items = frappe.db.count("Item", {"disabled": 0})
-        debug_info['total_enabled_items'] = total_items
-        
-        # Count Website Items
-        website_items_count = frappe.db.count("Website Item", {"published": 1})
-        debug_info['published_website_items'] = website_items_count
-        
-        # Check if items have corresponding Website Items
-        items_with_website_items = frappe.db.sql("""
-            SELECT COUNT(*) as count
-            FROM tabItem i
-            INNER JOIN `tabWebsite Item` wi ON i.name = wi.item_code
-            WHERE i.disabled = 0 AND wi.published = 1
-        """)[0][0]
-        debug_info['items_with_website_items'] = items_with_website_items
+        debug_info['total_enabled_items'] = counts.total_items
+        debug_info['published_website_items'] = counts.website_items_count
+        debug_info['items_with_website_items'] = counts.items_with_website_items
         
         # Sample Website Items
         sample_website_items = frappe.db.sql("""
@@ -1500,8 +1877,7 @@ def debug_pos_items():
         debug_info['sample_website_items'] = sample_website_items
         
         # Check Item Groups
-        item_groups_count = frappe.db.count("Item Group", {"is_group": 0})
-        debug_info['item_groups_count'] = item_groups_count
+        debug_info['item_groups_count'] = counts.item_groups_count
         
         return debug_info
         
@@ -1520,12 +1896,11 @@ def check_available_items():
         result['total_items'] = total_items
         
         # Check items with custom_material_type
-        items_with_material_type = frappe.db.sql("""
+        items_with_material_type = frappe.db.sql(f"""
             SELECT name, item_name, custom_material_type, item_group
             FROM tabItem 
-            WHERE disabled = 0 
-                AND custom_material_type IS NOT NULL 
-                AND custom_material_type != ''
+            WHERE {item_has_material_condition()}
+                AND disabled = 0
             LIMIT 10
         """, as_dict=True)
         result['items_with_material_type'] = items_with_material_type
@@ -1541,12 +1916,13 @@ def check_available_items():
         result['website_items'] = website_items
         
         # Check distinct material types
+        # GROUP BY on (disabled, custom_material_type) allows a loose index scan
         material_types = frappe.db.sql("""
-            SELECT DISTINCT custom_material_type
+            SELECT custom_material_type
             FROM tabItem 
-            WHERE custom_material_type IS NOT NULL 
+            WHERE disabled = 0
                 AND custom_material_type != ''
-                AND disabled = 0
+            GROUP BY custom_material_type
         """, as_dict=True)
         result['material_types'] = [mt['custom_material_type'] for mt in material_types]
         
@@ -1568,20 +1944,25 @@ def check_available_items():
 def create_sample_tax_template():
     """Create a basic sales tax template for fence operations"""
     try:
-        # Check if Standard Sales Tax template already exists
-        if not frappe.db.exists("Sales Taxes and Charges Template", "Standard Sales Tax"):
+        company = frappe.defaults.get_user_default("Company")
+        if not company:
+            return {"success": False, "error": "Set a default Company first"}
+        abbr = frappe.get_cached_value("Company", company, "abbr")
+        
+        # Check if Standard Sales Tax template already exists (named "<title> - <company abbr>")
+        if not frappe.db.exists("Sales Taxes and Charges Template", {"title": "Standard Sales Tax", "company": company}):
             tax_template = frappe.get_doc({
                 "doctype": "Sales Taxes and Charges Template",
                 "title": "Standard Sales Tax",
-                "company": "Fence Supply",
+                "company": company,
                 "is_default": 1,
                 "taxes": [
                     {
                         "charge_type": "On Net Total",
-                        "account_head": "Sales Tax - FS",  # You may need to adjust this
+                        "account_head": f"Sales Tax - {abbr}",  # You may need to adjust this
                         "description": "Sales Tax",
                         "rate": 6.625,  # NJ sales tax rate
-                        "cost_center": "Main - FS"  # You may need to adjust this
+                        "cost_center": f"Main - {abbr}"  # You may need to adjust this
                     }
                 ]
             })
@@ -1672,18 +2053,24 @@ def create_sample_fence_items():
         
         created_items = []
         
+        existing = set(frappe.get_all("Item",
+            filters={"name": ["in", [item_data["item_code"] for item_data in sample_items]]},
+            pluck="name"
+        ))
+        
         for item_data in sample_items:
             try:
                 # Check if item already exists
-                if frappe.db.exists("Item", item_data["item_code"]):
-                    print(f"Item {item_data['item_code']} already exists")
+                if item_data["item_code"] in existing:
+                    logger.info("Item %s already exists", item_data['item_code'])
                     continue
                 
-                # Create Item
+                # Create Item - sample data needs no Version history
                 item = frappe.get_doc({
                     "doctype": "Item",
                     **item_data
                 })
+                item.flags.ignore_version = True
                 item.insert(ignore_permissions=True)
                 
                 # Create Website Item
@@ -1693,25 +2080,27 @@ def create_sample_fence_items():
                     "web_item_name": item_data["item_name"],
                     "published": 1,
                     "route": f"/fence-products/{item_data['item_code'].lower()}",
-                    "website_warehouse": frappe.get_value("Stock Settings", None, "default_warehouse")
+                    "website_warehouse": get_default_warehouse()
                 })
                 website_item.insert(ignore_permissions=True)
                 
-                # Create Item Price
+                # Create Item Price - insert() so validate fills currency, UOM and selling from the price list
                 item_price = frappe.get_doc({
                     "doctype": "Item Price",
                     "item_code": item_data["item_code"],
                     "price_list": "Standard Selling",
                     "price_list_rate": item_data["standard_rate"]
                 })
+                item_price.flags.ignore_version = True
                 item_price.insert(ignore_permissions=True)
                 
                 created_items.append(item_data["item_code"])
-                print(f"✅ Created: {item_data['item_code']} - {item_data['item_name']}")
+                logger.info("✅ Created: %s - %s", item_data['item_code'], item_data['item_name'])
                 
             except Exception as item_error:
-                print(f"❌ Error creating {item_data['item_code']}: {str(item_error)}")
+                logger.error("❌ Error creating %s: %s", item_data['item_code'], item_error)
         
+        frappe.db.commit()
         return {
             "message": f"Created {len(created_items)} sample fence items",
             "items": created_items
@@ -1728,55 +2117,9 @@ def check_product_bundle(item_code):
     Now checks both Product Bundle doctype and Product Bundle item group
     """
     try:
-        # First check: Is the item in the 'Product Bundle' item group?
-        item_info = frappe.db.get_value(
-            "Item",
-            {"item_code": item_code},
-            ["item_group", "item_name", "description"],
-            as_dict=True
-        )
-        
-        if item_info and item_info.item_group == "Product Bundle":
-            print(f"📦 Item {item_code} is in Product Bundle item group")
-            return {
-                "is_bundle": True,
-                "bundle_name": item_info.item_name,
-                "bundle_items": []  # Will be populated from packed_items if available
-            }
-        
-        # Second check: Check if Product Bundle doctype exists for this item
-        bundle = frappe.db.get_value(
-            "Product Bundle", 
-            {"new_item_code": item_code}, 
-            ["name", "new_item_code"],
-            as_dict=True
-        )
+        # Repeat checks for the same item within one request are answered from memory
+        return get_request_cached(f"bundle:{item_code}", lambda: build_product_bundle_info(item_code))
         
-        if bundle:
-            # Get bundle items
-            bundle_items = frappe.db.get_all(
-                "Product Bundle Item",
-                filters={"parent": bundle.name},
-                fields=["item_code", "qty", "uom", "rate", "description"],
-                order_by="idx"
-            )
-            
-            # Get item names for each bundle item
-            for bundle_item in bundle_items:
-                item_name = frappe.db.get_value("Item", bundle_item.item_code, "item_name")
-                bundle_item["item_name"] = item_name
-            
-            return {
-                "is_bundle": True,
-                "bundle_name": bundle.name,
-                "bundle_items": bundle_items
-            }
-        else:
-            return {
-                "is_bundle": False,
-                "bundle_items": []
-            }
-            
     except Exception as e:
         frappe.log_error(f"Error checking product bundle for {item_code}: {str(e)}")
         return {
@@ -1784,6 +2127,61 @@ def check_product_bundle(item_code):
             "bundle_items": []
         }
 
+def build_product_bundle_info(item_code):
+    """Query the bundle information returned by check_product_bundle"""
+    # Item group, bundle header and bundle rows in a single round-trip
+    rows = frappe.db.sql("""
+        SELECT
+            i.item_group,
+            i.item_name AS bundle_item_name,
+            pb.name AS bundle_name,
+            pbi.item_code,
+            ci.item_name,
+            pbi.qty,
+            pbi.uom,
+            pbi.rate,
+            pbi.description
+        FROM `tabItem` i
+        LEFT JOIN `tabProduct Bundle` pb ON pb.new_item_code = i.name
+        LEFT JOIN `tabProduct Bundle Item` pbi ON pbi.parent = pb.name
+        LEFT JOIN `tabItem` ci ON ci.name = pbi.item_code
+        WHERE i.item_code = %s
+        ORDER BY pbi.idx
+    """, item_code, as_dict=True)
+    
+    if rows and rows[0].item_group == "Product Bundle":
+        # First check: Is the item in the 'Product Bundle' item group?
+        logger.debug("📦 Item %s is in Product Bundle item group", item_code)
+        result = {
+            "is_bundle": True,
+            "bundle_name": rows[0].bundle_item_name,
+            "bundle_items": []  # Will be populated from packed_items if available
+        }
+    elif rows and rows[0].bundle_name:
+        # Second check: Does a Product Bundle exist for this item?
+        result = {
+            "is_bundle": True,
+            "bundle_name": rows[0].bundle_name,
+            "bundle_items": [
+                frappe._dict(
+                    item_code=row.item_code,
+                    qty=row.qty,
+                    uom=row.uom,
+                    rate=row.rate,
+                    description=row.description,
+                    item_name=row.item_name
+                )
+                for row in rows if row.item_code
+            ]
+        }
+    else:
+        result = {
+            "is_bundle": False,
+            "bundle_items": []
+        }
+    
+    return result
+
 # =============================================================================
 # QUOTATION TEMPLATE FUNCTIONS
 # =============================================================================
@@ -1794,7 +2192,7 @@ def save_cart_as_template(template_name, description=None, category="Standard Fe
     Save current cart as a quotation template
     """
     try:
-        print(f"💾 Saving cart as template: {template_name}")
+        logger.debug("💾 Saving cart as template: %s", template_name)
         
         # Get current cart quotation
         cart_quotation = get_current_cart_quotation()
@@ -1862,7 +2260,7 @@ def save_cart_as_template(template_name, description=None, category="Standard Fe
         # Save template
         template_doc.insert(ignore_permissions=True)
         
-        print(f"✅ Template saved successfully: {template_doc.name}")
+        logger.debug("✅ Template saved successfully: %s", template_doc.name)
         return {
             "success": True,
             "message": f"Template '{template_name}' saved successfully",
@@ -1870,7 +2268,6 @@ def save_cart_as_template(template_name, description=None, category="Standard Fe
         }
         
     except Exception as e:
-        print(f"❌ Error saving template: {str(e)}")
         frappe.log_error(f"Error saving quotation template: {str(e)}")
         return {
             "success": False,
@@ -1883,7 +2280,7 @@ def get_quotation_templates(category="all", customer_type="all", search_term=Non
     Get quotation templates for POS system
     """
     try:
-        frappe.logger().info(f"🔍 DEBUG: Getting quotation templates - category: {category}, customer_type: {customer_type}, search_term: {search_term}")
+        logger.debug("🔍 Getting quotation templates - category: %s, customer_type: %s, search_term: %s", category, customer_type, search_term)
         
         filters = {}
         
@@ -1897,48 +2294,48 @@ def get_quotation_templates(category="all", customer_type="all", search_term=Non
         if search_term:
             filters["template_name"] = ["like", f"%{search_term}%"]
         
-        frappe.logger().info(f"🔍 DEBUG: Applied filters: {filters}")
+        logger.debug("🔍 Applied filters: %s", filters)
         
         # Get templates from Quotation Template doctype (if it exists) or use Quotation doctype
         templates = []
         
         # First try to get from Quotation Template doctype
         if frappe.db.exists("DocType", "Quotation Template"):
-            frappe.logger().info(f"🔍 DEBUG: Quotation Template doctype exists, querying...")
+            logger.debug("🔍 Quotation Template doctype exists, querying...")
             templates = frappe.get_all("Quotation Template",
                 filters=filters,
                 fields=["name", "template_name", "description", "category", "customer_type", "use_count"],
                 order_by="modified desc"
             )
-            frappe.logger().info(f"✅ DEBUG: Found {len(templates)} templates in Quotation Template doctype")
+            logger.debug("✅ Found %s templates in Quotation Template doctype", len(templates))
         else:
-            frappe.logger().info(f"🔍 DEBUG: Quotation Template doctype doesn't exist, checking Quotation doctype...")
+            logger.debug("🔍 Quotation Template doctype doesn't exist, checking Quotation doctype...")
             # Fallback: get from Quotation doctype where status = "Template"
             filters["status"] = "Template"
-            frappe.logger().info(f"🔍 DEBUG: Querying Quotation doctype with filters: {filters}")
+            logger.debug("🔍 Querying Quotation doctype with filters: %s", filters)
             templates = frappe.get_all("Quotation",
                 filters=filters,
                 fields=["name", "template_name", "description", "category", "customer_type", "use_count"],
                 order_by="modified desc"
             )
-            frappe.logger().info(f"✅ DEBUG: Found {len(templates)} templates in Quotation doctype")
+            logger.debug("✅ Found %s templates in Quotation doctype", len(templates))
         
         # Debug: Check what templates were found
         for i, template in enumerate(templates):
-            frappe.logger().info(f"🔍 DEBUG: Template {i+1}: {template.get('name', 'N/A')} - {template.get('template_name', 'N/A')}")
+            logger.debug("🔍 Template %s: %s - %s", i+1, template.get('name', 'N/A'), template.get('template_name', 'N/A'))
         
         # If no templates found, create a sample one for testing
         if not templates:
-            frappe.logger().info(f"🔍 DEBUG: No templates found, creating sample template...")
+            logger.debug("🔍 No templates found, creating sample template...")
             # Create a sample template for testing
             sample_template = create_sample_template()
             if sample_template:
                 templates = [sample_template]
-                frappe.logger().info(f"✅ DEBUG: Sample template created: {sample_template.get('template_name', 'N/A')}")
+                logger.debug("✅ Sample template created: %s", sample_template.get('template_name', 'N/A'))
             else:
-                frappe.logger().error(f"❌ DEBUG: Failed to create sample template")
+                logger.error("❌ Failed to create sample template")
         
-        frappe.logger().info(f"✅ DEBUG: Returning {len(templates)} templates")
+        logger.debug("✅ Returning %s templates", len(templates))
         
         return {
             "success": True,
@@ -1953,7 +2350,7 @@ def get_quotation_templates(category="all", customer_type="all", search_term=Non
         
     except Exception as e:
         frappe.log_error(f"Error getting quotation templates: {str(e)}")
-        frappe.logger().error(f"❌ DEBUG: Error getting templates: {str(e)}")
+        logger.error("❌ Error getting templates: %s", e)
         return {
             "success": False,
             "message": f"Failed to load templates: {str(e)}",
@@ -1971,104 +2368,104 @@ def load_quotation_template(template_name, price_list=None):
     Load a quotation template and create a cart quotation from it
     """
     try:
-        frappe.logger().info(f"🔍 DEBUG: Starting template load for '{template_name}'")
-        frappe.logger().info(f"🔍 DEBUG: Current user: {frappe.session.user}")
-        frappe.logger().info(f"🔍 DEBUG: Price list: {price_list}")
+        logger.debug("🔍 Starting template load for '%s'", template_name)
+        logger.debug("🔍 Current user: %s", frappe.session.user)
+        logger.debug("🔍 Price list: %s", price_list)
         
         # Clear existing cart first
-        frappe.logger().info(f"🔍 DEBUG: Clearing existing cart...")
+        logger.debug("🔍 Clearing existing cart...")
         try:
             cart.clear_cart()
-            frappe.logger().info(f"✅ DEBUG: Cart cleared successfully")
+            logger.debug("✅ Cart cleared successfully")
         except Exception as clear_error:
-            frappe.logger().info(f"⚠️ DEBUG: Cart clear warning (may be expected): {str(clear_error)}")
+            logger.debug("⚠️ Cart clear warning (may be expected): %s", clear_error)
         
         # Get template data
         template = None
-        frappe.logger().info(f"🔍 DEBUG: Looking for template '{template_name}'...")
+        logger.debug("🔍 Looking for template '%s'...", template_name)
         
         # Try to get from Quotation Template doctype first
         if frappe.db.exists("DocType", "Quotation Template"):
-            frappe.logger().info(f"🔍 DEBUG: Quotation Template doctype exists, trying to get template...")
+            logger.debug("🔍 Quotation Template doctype exists, trying to get template...")
             if frappe.db.exists("Quotation Template", template_name):
                 template = frappe.get_doc("Quotation Template", template_name)
-                frappe.logger().info(f"✅ DEBUG: Found template in Quotation Template doctype")
+                logger.debug("✅ Found template in Quotation Template doctype")
             else:
-                frappe.logger().info(f"❌ DEBUG: Template '{template_name}' not found in Quotation Template doctype")
+                logger.debug("❌ Template '%s' not found in Quotation Template doctype", template_name)
         else:
-            frappe.logger().info(f"🔍 DEBUG: Quotation Template doctype doesn't exist, checking Quotation doctype...")
+            logger.debug("🔍 Quotation Template doctype doesn't exist, checking Quotation doctype...")
             # Fallback: get from Quotation doctype
             if frappe.db.exists("Quotation", template_name):
                 template = frappe.get_doc("Quotation", template_name)
-                frappe.logger().info(f"✅ DEBUG: Found template in Quotation doctype")
+                logger.debug("✅ Found template in Quotation doctype")
             else:
-                frappe.logger().info(f"❌ DEBUG: Template '{template_name}' not found in Quotation doctype")
+                logger.debug("❌ Template '%s' not found in Quotation doctype", template_name)
         
         if not template:
-            frappe.logger().error(f"❌ DEBUG: Template '{template_name}' not found in any doctype")
+            logger.error("❌ Template '%s' not found in any doctype", template_name)
             return {
                 "success": False,
                 "message": f"Template '{template_name}' not found"
             }
         
-        frappe.logger().info(f"✅ DEBUG: Template found: {template.name}, status: {getattr(template, 'status', 'N/A')}")
+        logger.debug("✅ Template found: %s, status: %s", template.name, getattr(template, 'status', 'N/A'))
         
         # Handle different template structures
         template_items = []
         if hasattr(template, 'items'):
             template_items = template.items
-            frappe.logger().info(f"🔍 DEBUG: Template has {len(template_items)} items (standard items)")
+            logger.debug("🔍 Template has %s items (standard items)", len(template_items))
         elif hasattr(template, 'template_items'):
             template_items = template.template_items
-            frappe.logger().info(f"🔍 DEBUG: Template has {len(template_items)} items (template_items)")
+            logger.debug("🔍 Template has %s items (template_items)", len(template_items))
         else:
-            frappe.logger().info(f"🔍 DEBUG: Template structure unknown - checking available attributes")
+            logger.debug("🔍 Template structure unknown - checking available attributes")
             available_attrs = [attr for attr in dir(template) if not attr.startswith('_')]
-            frappe.logger().info(f"🔍 DEBUG: Available template attributes: {available_attrs}")
+            logger.debug("🔍 Available template attributes: %s", available_attrs)
             
             # Try to find any item-like attributes
             for attr in available_attrs:
                 try:
                     attr_value = getattr(template, attr)
                     if hasattr(attr_value, '__len__') and attr != 'name':
-                        frappe.logger().info(f"🔍 DEBUG: Attribute '{attr}' has length {len(attr_value)}")
+                        logger.debug("🔍 Attribute '%s' has length %s", attr, len(attr_value))
                 except:
                     pass
         
-        frappe.logger().info(f"🔍 DEBUG: Template has {len(template_items)} items to process")
+        logger.debug("🔍 Template has %s items to process", len(template_items))
         
         # Check user permissions
-        frappe.logger().info(f"🔍 DEBUG: Checking user permissions for Quotation doctype...")
+        logger.debug("🔍 Checking user permissions for Quotation doctype...")
         try:
             can_read = frappe.has_permission("Quotation", "read")
             can_write = frappe.has_permission("Quotation", "write")
             can_create = frappe.has_permission("Quotation", "create")
-            frappe.logger().info(f"🔍 DEBUG: Permissions - Read: {can_read}, Write: {can_write}, Create: {can_create}")
+            logger.debug("🔍 Permissions - Read: %s, Write: %s, Create: %s", can_read, can_write, can_create)
         except Exception as perm_error:
-            frappe.logger().error(f"❌ DEBUG: Permission check failed: {str(perm_error)}")
+            logger.error("❌ Permission check failed: %s", perm_error)
         
         # Get or create webshop cart quotation
-        frappe.logger().info(f"🔍 DEBUG: Getting webshop cart quotation...")
+        logger.debug("🔍 Getting webshop cart quotation...")
         cart_response = cart.get_cart_quotation()
         cart_quotation = cart_response.get("doc")
         
         if not cart_quotation:
-            frappe.logger().info(f"🔍 DEBUG: No existing cart found, creating new one...")
+            logger.debug("🔍 No existing cart found, creating new one...")
             cart_quotation = frappe.new_doc("Quotation")
             cart_quotation.quotation_to = "Customer"
             cart_quotation.party_name = frappe.session.user
             cart_quotation.selling_price_list = price_list or "Standard Selling"
             cart_quotation.status = "Draft"
         else:
-            frappe.logger().info(f"🔍 DEBUG: Using existing cart: {cart_quotation.name}")
+            logger.debug("🔍 Using existing cart: %s", cart_quotation.name)
         
-        frappe.logger().info(f"🔍 DEBUG: Cart quotation created, copying {len(template_items)} items...")
+        logger.debug("🔍 Cart quotation created, copying %s items...", len(template_items))
         
         # Copy items from template
         items_added = 0
         for i, item in enumerate(template_items):
             try:
-                frappe.logger().info(f"🔍 DEBUG: Adding item {i+1}: {item.item_code} (qty: {item.qty}, rate: {item.rate})")
+                logger.debug("🔍 Adding item %s: %s (qty: %s, rate: %s)", i+1, item.item_code, item.qty, item.rate)
                 cart_quotation.append("items", {
                     "item_code": item.item_code,
                     "item_name": item.item_name,
@@ -2079,43 +2476,43 @@ def load_quotation_template(template_name, price_list=None):
                     "amount": item.amount
                 })
                 items_added += 1
-                frappe.logger().info(f"✅ DEBUG: Item {i+1} added successfully")
+                logger.debug("✅ Item %s added successfully", i+1)
             except Exception as item_error:
-                frappe.logger().error(f"❌ DEBUG: Failed to add item {i+1} ({item.item_code}): {str(item_error)}")
+                logger.error("❌ Failed to add item %s (%s): %s", i+1, item.item_code, item_error)
         
-        frappe.logger().info(f"✅ DEBUG: {items_added} items copied to cart quotation")
+        logger.debug("✅ %s items copied to cart quotation", items_added)
         
         # Save the cart quotation
         if cart_quotation.is_new():
-            frappe.logger().info(f"🔍 DEBUG: Inserting new cart quotation...")
+            logger.debug("🔍 Inserting new cart quotation...")
             try:
                 cart_quotation.insert(ignore_permissions=True)
-                frappe.logger().info(f"✅ DEBUG: Cart quotation inserted successfully: {cart_quotation.name}")
+                logger.debug("✅ Cart quotation inserted successfully: %s", cart_quotation.name)
             except Exception as insert_error:
-                frappe.logger().error(f"❌ DEBUG: Failed to insert cart quotation: {str(insert_error)}")
+                logger.error("❌ Failed to insert cart quotation: %s", insert_error)
                 raise insert_error
         else:
-            frappe.logger().info(f"🔍 DEBUG: Updating existing cart quotation...")
+            logger.debug("🔍 Updating existing cart quotation...")
         
-        frappe.logger().info(f"🔍 DEBUG: Saving cart quotation...")
+        logger.debug("🔍 Saving cart quotation...")
         try:
             cart_quotation.save(ignore_permissions=True)
-            frappe.logger().info(f"✅ DEBUG: Cart quotation saved successfully")
+            logger.debug("✅ Cart quotation saved successfully")
         except Exception as save_error:
-            frappe.logger().error(f"❌ DEBUG: Failed to save cart quotation: {str(save_error)}")
+            logger.error("❌ Failed to save cart quotation: %s", save_error)
             raise save_error
         
         # Update template use count
         if hasattr(template, 'use_count'):
-            frappe.logger().info(f"🔍 DEBUG: Updating template use count...")
+            logger.debug("🔍 Updating template use count...")
             try:
                 template.use_count = (template.use_count or 0) + 1
                 template.save(ignore_permissions=True)
-                frappe.logger().info(f"✅ DEBUG: Template use count updated to {template.use_count}")
+                logger.debug("✅ Template use count updated to %s", template.use_count)
             except Exception as use_count_error:
-                frappe.logger().error(f"⚠️ DEBUG: Failed to update use count (non-critical): {str(use_count_error)}")
+                logger.debug("⚠️ Failed to update use count (non-critical): %s", use_count_error)
         
-        frappe.logger().info(f"✅ DEBUG: Template loading completed successfully")
+        logger.debug("✅ Template loading completed successfully")
         
         return {
             "success": True,
@@ -2135,7 +2532,7 @@ def load_quotation_template(template_name, price_list=None):
         error_type = type(e).__name__
         error_message = str(e)
         
-        frappe.logger().error(f"❌ DEBUG: Template loading failed - {error_type}: {error_message}")
+        logger.error("❌ Template loading failed - %s: %s", error_type, error_message)
         frappe.log_error(f"Template loading failed: {error_type}: {error_message}")
         
         return {
@@ -2192,7 +2589,7 @@ def create_sample_template():
     Create a sample template for testing if no templates exist
     """
     try:
-        frappe.logger().info(f"🔍 DEBUG: Creating sample template...")
+        logger.debug("🔍 Creating sample template...")
         
         # Create a sample template with basic fence items
         sample_template = frappe.new_doc("Quotation")
@@ -2206,7 +2603,7 @@ def create_sample_template():
         sample_template.customer_type = "Both"
         sample_template.use_count = 0
         
-        frappe.logger().info(f"✅ DEBUG: Sample template document created")
+        logger.debug("✅ Sample template document created")
         
         # Add sample items (you may need to adjust these item codes based on your actual items)
         sample_items = [
@@ -2229,9 +2626,9 @@ def create_sample_template():
         items_added = 0
         for item_data in sample_items:
             # Check if item exists before adding
-            frappe.logger().info(f"🔍 DEBUG: Checking if item exists: {item_data['item_code']}")
+            logger.debug("🔍 Checking if item exists: %s", item_data['item_code'])
             if frappe.db.exists("Item", item_data["item_code"]):
-                frappe.logger().info(f"✅ DEBUG: Item {item_data['item_code']} exists, adding to template")
+                logger.debug("✅ Item %s exists, adding to template", item_data['item_code'])
                 sample_template.append("items", {
                     "item_code": item_data["item_code"],
                     "item_name": item_data["item_name"],
@@ -2242,17 +2639,17 @@ def create_sample_template():
                 })
                 items_added += 1
             else:
-                frappe.logger().info(f"⚠️ DEBUG: Item {item_data['item_code']} doesn't exist, skipping")
+                logger.debug("⚠️ Item %s doesn't exist, skipping", item_data['item_code'])
         
-        frappe.logger().info(f"✅ DEBUG: Added {items_added} items to sample template")
+        logger.debug("✅ Added %s items to sample template", items_added)
         
-        frappe.logger().info(f"🔍 DEBUG: Inserting sample template...")
+        logger.debug("🔍 Inserting sample template...")
         sample_template.insert(ignore_permissions=True)
-        frappe.logger().info(f"✅ DEBUG: Sample template inserted: {sample_template.name}")
+        logger.debug("✅ Sample template inserted: %s", sample_template.name)
         
-        frappe.logger().info(f"🔍 DEBUG: Saving sample template...")
+        logger.debug("🔍 Saving sample template...")
         sample_template.save(ignore_permissions=True)
-        frappe.logger().info(f"✅ DEBUG: Sample template saved successfully")
+        logger.debug("✅ Sample template saved successfully")
         
         result = {
             "name": sample_template.name,
@@ -2263,13 +2660,13 @@ def create_sample_template():
             "use_count": 0
         }
         
-        frappe.logger().info(f"✅ DEBUG: Sample template created successfully: {result}")
+        logger.debug("✅ Sample template created successfully: %s", result)
         return result
         
     except Exception as e:
         frappe.log_error(f"Error creating sample template: {str(e)}")
-        frappe.logger().error(f"❌ DEBUG: Failed to create sample template: {str(e)}")
-        frappe.logger().error(f"❌ DEBUG: Traceback: {frappe.get_traceback()}")
+        logger.error("❌ Failed to create sample template: %s", e)
+        logger.error("❌ Traceback: %s", frappe.get_traceback())
         return None
 
 # Helper functions for quotation templates
@@ -2294,12 +2691,12 @@ def get_current_cart_quotation():
         # Create new cart quotation
         party = get_party()
         if not party:
-            print(f"❌ Error: Could not get party for user {frappe.session.user}")
+            logger.warning("⚠️ Could not get party for user %s", frappe.session.user)
             return None
             
         company = frappe.db.get_single_value("Webshop Settings", "company")
         if not company:
-            print(f"❌ Error: No company set in Webshop Settings")
+            logger.error("❌ Error: No company set in Webshop Settings")
             return None
         
         quotation = frappe.get_doc({
@@ -2317,13 +2714,11 @@ def get_current_cart_quotation():
         quotation.flags.ignore_permissions = True
         quotation.insert()
         
-        print(f"✅ Created new cart quotation: {quotation.name}")
+        logger.debug("✅ Created new cart quotation: %s", quotation.name)
         return quotation
         
     except Exception as e:
-        print(f"❌ Error getting cart quotation: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        frappe.log_error(f"Error getting cart quotation: {str(e)}")
         return None
 
 def clear_current_cart():
@@ -2337,7 +2732,7 @@ def clear_current_cart():
             cart_quotation.flags.ignore_permissions = True
             cart_quotation.save()
     except Exception as e:
-        print(f"❌ Error clearing cart: {str(e)}")
+        logger.error("❌ Error clearing cart: %s", e)
 
 def get_bundle_items_from_cart(item_code):
     """Get bundle items from current cart for a specific item"""
@@ -2365,7 +2760,7 @@ def get_bundle_items_from_cart(item_code):
         return packed_items
         
     except Exception as e:
-        print(f"❌ Error getting bundle items: {str(e)}")
+        logger.error("❌ Error getting bundle items: %s", e)
         return []
 
 def get_item_price(item_code, price_list):
@@ -2386,7 +2781,7 @@ def get_item_price(item_code, price_list):
         return price
         
     except Exception as e:
-        print(f"❌ Error getting item price: {str(e)}")
+        logger.error("❌ Error getting item price: %s", e)
         return None
 
 # =============================================================================
@@ -2400,7 +2795,7 @@ def get_bundles_by_material_type(material_type=None, price_list=None):
     Now uses the 'Product Bundle' item group for proper bundle detection
     """
     try:
-        print(f"🔍 Getting bundles for material type: {material_type}")
+        logger.debug("🔍 Getting bundles for material type: %s", material_type)
         
         # Primary method: Get items from 'Product Bundle' item group
         bundles_query = """
@@ -2443,7 +2838,7 @@ def get_bundles_by_material_type(material_type=None, price_list=None):
         
         # Fallback method: Also check for items with packed_items (existing bundles in cart)
         if not bundles:
-            print("📦 No bundles found in Product Bundle item group, checking for items with packed_items...")
+            logger.debug("📦 No bundles found in Product Bundle item group, checking for items with packed_items...")
             packed_bundles_query = """
                 SELECT DISTINCT 
                     qi.item_code,
@@ -2479,7 +2874,7 @@ def get_bundles_by_material_type(material_type=None, price_list=None):
                 except:
                     pass
         
-        print(f"📦 Found {len(bundles)} bundles from Product Bundle item group")
+        logger.debug("📦 Found %s bundles from Product Bundle item group", len(bundles))
         return {
             "bundles": bundles,
             "material_type": material_type,
@@ -2487,7 +2882,6 @@ def get_bundles_by_material_type(material_type=None, price_list=None):
         }
         
     except Exception as e:
-        print(f"❌ Error getting bundles: {str(e)}")
         frappe.log_error(f"Error getting bundles by material type: {str(e)}")
         return {
             "bundles": [],
@@ -2503,62 +2897,175 @@ def get_product_bundle_items(bundle_name):
     Whitelisted alternative to frappe.client.get_list for Product Bundle Item
     """
     try:
-        bundle_items = frappe.db.get_all(
-            "Product Bundle Item",
-            filters={"parent": bundle_name},
-            fields=["item_code", "qty", "uom", "rate", "description"],
-            order_by="idx"
-        )
-        
-        # Get item names for each bundle item
-        for bundle_item in bundle_items:
-            item_name = frappe.db.get_value("Item", bundle_item.item_code, "item_name")
-            bundle_item["item_name"] = item_name
-        
-        return bundle_items
+        BundleItem = frappe.qb.DocType("Product Bundle Item")
+        Item = frappe.qb.DocType("Item")
+        
+        # Item names come from the same query instead of a lookup per row
+        return (
+            frappe.qb.from_(BundleItem)
+            .left_join(Item).on(Item.name == BundleItem.item_code)
+            .select(
+                BundleItem.item_code,
+                BundleItem.qty,
+                BundleItem.uom,
+                BundleItem.rate,
+                BundleItem.description,
+                Item.item_name
+            )
+            .where(BundleItem.parent == bundle_name)
+            .orderby(BundleItem.idx)
+        ).run(as_dict=True)
         
     except Exception as e:
         frappe.log_error(f"Error getting bundle items for {bundle_name}: {str(e)}")
         return []
 
 @frappe.whitelist()
-def search_customers_for_pos(search_term=""):
+def search_customers_for_pos(search_term="", start=0, page_length=20, with_paging=0):
     """
     Search customers for POS system
     Whitelisted alternative to frappe.client.get_list for Customer
+    Returns one page of customers; with_paging=1 wraps it with has_more and next_start
     """
+    start = max(cint(start), 0)
+    page_length = max(1, min(cint(page_length) or 20, 100))
+    
     try:
         if not search_term or len(search_term) < 2:
-            # Return recent customers or top customers
-            customers = frappe.db.get_all(
-                "Customer",
-                fields=["name", "customer_name", "customer_group", "mobile_no", "email_id", "default_price_list"],
-                limit=20,
-                order_by="modified desc"
-            )
-        else:
-            # Search by name, mobile, or email
-            customers = frappe.db.sql("""
-                SELECT name, customer_name, customer_group, mobile_no, email_id, default_price_list
-                FROM `tabCustomer`
-                WHERE disabled = 0
-                AND (
-                    customer_name LIKE %(search)s 
-                    OR mobile_no LIKE %(search)s 
-                    OR email_id LIKE %(search)s
-                    OR name LIKE %(search)s
+            # Most recently modified customers first, read in order from the index on modified
+            Customer = frappe.qb.DocType("Customer")
+            customers = (
+                frappe.qb.from_(Customer)
+                .select(
+                    Customer.name,
+                    Customer.customer_name,
+                    Customer.customer_group,
+                    Customer.mobile_no,
+                    Customer.email_id,
+                    Customer.default_price_list
                 )
-                ORDER BY customer_name
-                LIMIT 20
-            """, {
-                "search": f"%{search_term}%"
-            }, as_dict=True)
+                .orderby(Customer.modified, order=frappe.qb.desc)
+                .limit(page_length)
+                .offset(start)
+            ).run(as_dict=True)
+        else:
+            customers = search_customers_by_term(search_term, start, page_length)
         
-        return customers
+        if not cint(with_paging):
+            return customers
+        
+        return {
+            "customers": customers,
+            "has_more": len(customers) == page_length,
+            "next_start": start + len(customers)
+        }
         
     except Exception as e:
         frappe.log_error(f"Error searching customers: {str(e)}")
-        return []
+        if not cint(with_paging):
+            return []
+        return {"customers": [], "has_more": False, "next_start": start}
+
+_FULLTEXT_TOKEN_RE = re.compile(r"\w+")
+
+
+def has_fulltext_index(doctype, index_name):
+    """Whether the FULLTEXT index from the add_pos_fulltext_indexes patch exists"""
+    return get_request_cached(
+        f"fulltext:{doctype}:{index_name}",
+        lambda: bool(frappe.db.sql(
+            f"SHOW INDEX FROM `tab{doctype}` WHERE Key_name = %s AND Index_type = 'FULLTEXT'",
+            index_name
+        ))
+    )
+
+
+def get_fulltext_min_token_size():
+    return get_request_cached(
+        "fulltext_min_token_size",
+        lambda: cint(frappe.db.sql("SELECT @@innodb_ft_min_token_size")[0][0]) or 3
+    )
+
+
+def build_fulltext_query(search_term):
+    """
+    Boolean-mode query requiring a prefix match on every word of the search term, e.g. "+vinyl* +white*".
+    Returns None when a word is shorter than innodb_ft_min_token_size, since
+    FULLTEXT would silently ignore it; callers fall back to LIKE then.
+    """
+    tokens = _FULLTEXT_TOKEN_RE.findall(search_term or "")
+    if not tokens or any(len(token) < get_fulltext_min_token_size() for token in tokens):
+        return None
+    
+    return " ".join(f"+{token}*" for token in tokens)
+
+
+def search_customers_by_term(search_term, start, page_length):
+    """
+    Prefix matches on name or mobile first (these can use an index), then
+    the slower contains scan only when the prefix matches run out
+    """
+    params = {
+        "prefix": f"{escape_like(search_term)}%",
+        "search": f"%{escape_like(search_term)}%",
+        "start": start,
+        "page_length": page_length
+    }
+    
+    customers = frappe.db.sql("""
+        SELECT name, customer_name, customer_group, mobile_no, email_id, default_price_list
+        FROM `tabCustomer`
+        WHERE disabled = 0 AND customer_name LIKE %(prefix)s ESCAPE '\\\\'
+        UNION
+        SELECT name, customer_name, customer_group, mobile_no, email_id, default_price_list
+        FROM `tabCustomer`
+        WHERE disabled = 0 AND mobile_no LIKE %(prefix)s ESCAPE '\\\\'
+        ORDER BY customer_name, name
+        LIMIT %(page_length)s OFFSET %(start)s
+    """, params, as_dict=True)
+    
+    if len(customers) == page_length:
+        return customers
+    
+    # Work out how far into the contains-only matches this page starts
+    if customers or not start:
+        prefix_count = start + len(customers)
+    else:
+        prefix_count = frappe.db.sql("""
+            SELECT COUNT(*) FROM `tabCustomer`
+            WHERE disabled = 0
+            AND (customer_name LIKE %(prefix)s ESCAPE '\\\\' OR mobile_no LIKE %(prefix)s ESCAPE '\\\\')
+        """, params)[0][0]
+    
+    params["start"] = start + len(customers) - prefix_count
+    params["page_length"] = page_length - len(customers)
+    
+    # Search by name, mobile, or email through the FULLTEXT index when the term allows it,
+    # otherwise with a contains scan
+    params["fulltext"] = build_fulltext_query(search_term)
+    if params["fulltext"] and has_fulltext_index("Customer", "ft_customer_search"):
+        match_condition = "MATCH(name, customer_name, mobile_no, email_id) AGAINST (%(fulltext)s IN BOOLEAN MODE)"
+    else:
+        match_condition = """(
+            customer_name LIKE %(search)s ESCAPE '\\\\'
+            OR mobile_no LIKE %(search)s ESCAPE '\\\\'
+            OR email_id LIKE %(search)s ESCAPE '\\\\'
+            OR name LIKE %(search)s ESCAPE '\\\\'
+        )"""
+    
+    # Skip rows the prefix pass already returned
+    customers += frappe.db.sql(f"""
+        SELECT name, customer_name, customer_group, mobile_no, email_id, default_price_list
+        FROM `tabCustomer`
+        WHERE disabled = 0
+        AND {match_condition}
+        AND IFNULL(customer_name, '') NOT LIKE %(prefix)s ESCAPE '\\\\'
+        AND IFNULL(mobile_no, '') NOT LIKE %(prefix)s ESCAPE '\\\\'
+        ORDER BY customer_name, name
+        LIMIT %(page_length)s OFFSET %(start)s
+    """, params, as_dict=True)
+    
+    return customers
 
 @frappe.whitelist()
 def setup_fence_item_attributes():
@@ -2571,57 +3078,36 @@ def setup_fence_item_attributes():
         # MAINTENANCE FREE: Use existing attributes from Customize Form
         # setup_fence_attributes()  # Commented out - user manages attributes via UI
         
-        # Get all fence items (items that already have variant attributes)
+        # Get all fence items with their attribute count in the same pass
         fence_items = frappe.db.sql("""
-            SELECT DISTINCT i.name, i.item_name, i.has_variants, i.is_sales_item, i.disabled
+            SELECT i.name, i.item_name, i.has_variants, i.is_sales_item, i.disabled,
+                COUNT(iva.name) as attribute_count
             FROM `tabItem` i
             LEFT JOIN `tabItem Variant Attribute` iva ON i.name = iva.parent
             WHERE (i.name LIKE '%Vinyl%' OR i.item_name LIKE '%Vinyl%')
                 AND i.disabled = 0
+            GROUP BY i.name, i.item_name, i.has_variants, i.is_sales_item, i.disabled
             ORDER BY i.name
         """, as_dict=True)
         
-        updated_count = 0
-        processed_items = []
-        items_with_attributes = 0
+        items_with_attributes = sum(1 for item in fence_items if item.attribute_count)
         
-        for item in fence_items:
-            item_name = item.name
-            needs_update = False
-            updates = {}
-            
-            # Check if item has any variant attributes
-            has_attributes = frappe.db.count("Item Variant Attribute", {"parent": item_name}) > 0
-            if has_attributes:
-                items_with_attributes += 1
-            
-            # Ensure item is sellable if it has attributes
-            if has_attributes:
-                # Make sure it's not a template (has_variants should be 0 for sellable items)
-                if item.has_variants != 0:
-                    updates["has_variants"] = 0
-                    needs_update = True
-                
-                # Ensure it's marked as sales item
-                if item.is_sales_item != 1:
-                    updates["is_sales_item"] = 1
-                    needs_update = True
-                
-                # Ensure it's not disabled
-                if item.disabled != 0:
-                    updates["disabled"] = 0
-                    needs_update = True
-            
-            # Apply updates if needed
-            if needs_update and updates:
-                try:
-                    frappe.db.set_value("Item", item_name, updates)
-                    updated_count += 1
-                    processed_items.append(item_name)
-                except Exception as e:
-                    frappe.log_error(f"Error updating item {item_name}: {str(e)}")
+        # Items with attributes must be sellable: not a template, a sales item and enabled
+        processed_items = [
+            item.name for item in fence_items
+            if item.attribute_count and (item.has_variants != 0 or item.is_sales_item != 1 or item.disabled != 0)
+        ]
         
-        frappe.db.commit()
+        # One UPDATE for every item that needs fixing instead of a set_value per item
+        if processed_items:
+            frappe.db.sql("""
+                UPDATE `tabItem`
+                SET has_variants = 0, is_sales_item = 1, disabled = 0,
+                    modified = %s, modified_by = %s
+                WHERE name IN %s
+            """, (frappe.utils.now(), frappe.session.user, tuple(processed_items)))
+        updated_count = len(processed_items)
+        clear_pos_analysis_cache()
         
         # Get summary of attribute coverage
         attribute_summary = frappe.db.sql("""
@@ -2676,65 +3162,69 @@ def setup_fence_item_attributes():
             "error": str(e)
         }
 
+# Attribute name patterns for get_dynamic_fence_attributes
+_HEIGHT_RE = re.compile(r"height", re.I)
+_COLOR_RE = re.compile(r"colou?r", re.I)
+_RAIL_TYPE_RE = re.compile(r"rail (?:type|style)", re.I)
+
 @frappe.whitelist()
 def get_dynamic_fence_attributes():
+    return get_analysis_cached("dynamic_fence_attributes", build_dynamic_fence_attributes)
+
+def build_dynamic_fence_attributes():
     """
     Get all available fence attribute values from items with attributes.
     This makes the POS system completely dynamic - new attributes appear automatically.
     """
     
     try:
-        # Get ALL attribute values from ANY sellable items (completely dynamic)
+        # Get ALL attribute values from ANY sellable items (completely dynamic),
+        # already bucketed per attribute with its total item count
         attributes = frappe.db.sql("""
-            SELECT 
-                iva.attribute,
-                iva.attribute_value,
-                COUNT(DISTINCT i.name) as item_count
-            FROM `tabItem Variant Attribute` iva
-            INNER JOIN `tabItem` i ON iva.parent = i.name
-            WHERE i.disabled = 0
-                AND i.has_variants = 0
-                AND i.is_sales_item = 1
-                AND (i.custom_material_type IS NOT NULL OR i.item_group IS NOT NULL)
-            GROUP BY iva.attribute, iva.attribute_value
-            HAVING item_count > 0
-            ORDER BY iva.attribute, iva.attribute_value
+            SELECT
+                attribute,
+                JSON_ARRAYAGG(
+                    JSON_OBJECT('value', attribute_value, 'item_count', item_count)
+                    ORDER BY attribute_value
+                ) as attr_values,
+                SUM(item_count) as total_items
+            FROM (
+                SELECT 
+                    iva.attribute,
+                    iva.attribute_value,
+                    COUNT(DISTINCT i.name) as item_count
+                FROM `tabItem Variant Attribute` iva
+                INNER JOIN `tabItem` i ON iva.parent = i.name
+                WHERE i.disabled = 0
+                    AND i.has_variants = 0
+                    AND i.is_sales_item = 1
+                    AND (i.custom_material_type IS NOT NULL OR i.item_group IS NOT NULL)
+                GROUP BY iva.attribute, iva.attribute_value
+            ) value_counts
+            GROUP BY attribute
+            ORDER BY attribute
         """, as_dict=True)
         
-        # Organize by attribute type
-        organized_attributes = {}
-        for attr in attributes:
-            attr_name = attr.attribute
-            if attr_name not in organized_attributes:
-                organized_attributes[attr_name] = []
-            
-            organized_attributes[attr_name].append({
-                "value": attr.attribute_value,
-                "item_count": attr.item_count
-            })
+        organized_attributes = {attr.attribute: json.loads(attr.attr_values) for attr in attributes}
         
         # MAINTENANCE FREE: Auto-detect which attributes to use for height/color/rail type selection
         # Based on common naming patterns - completely scalable
-        height_keywords = ['height', 'fence height', 'post height']
-        color_keywords = ['color', 'fence color']
-        rail_type_keywords = ['rail type', 'ranch rail type', 'rail style']
-        
-        # Find the best height, color, and rail type attributes dynamically
         height_attribute = None
         color_attribute = None
         rail_type_attribute = None
         
-        for attr_name in organized_attributes.keys():
-            attr_lower = attr_name.lower()
+        for attr_name in organized_attributes:
             # Find height attribute
-            if not height_attribute and any(keyword in attr_lower for keyword in height_keywords):
+            if not height_attribute and _HEIGHT_RE.search(attr_name):
                 height_attribute = attr_name
             # Find color attribute  
-            if not color_attribute and any(keyword in attr_lower for keyword in color_keywords):
+            if not color_attribute and _COLOR_RE.search(attr_name):
                 color_attribute = attr_name
             # Find rail type attribute
-            if not rail_type_attribute and any(keyword in attr_lower for keyword in rail_type_keywords):
+            if not rail_type_attribute and _RAIL_TYPE_RE.search(attr_name):
                 rail_type_attribute = attr_name
+            if height_attribute and color_attribute and rail_type_attribute:
+                break
         
         return {
             "success": True,
@@ -2744,7 +3234,7 @@ def get_dynamic_fence_attributes():
             "rail_type_attribute": rail_type_attribute,  # Which attribute to use for rail type selection
             "available_attributes": list(organized_attributes.keys()),  # All available attributes
             "total_attribute_types": len(organized_attributes),
-            "total_items_with_attributes": sum(attr.item_count for attr in attributes)
+            "total_items_with_attributes": sum(int(attr.total_items) for attr in attributes)
         }
         
     except Exception as e:
@@ -2755,60 +3245,91 @@ def get_dynamic_fence_attributes():
         }
 
 @frappe.whitelist()
-def debug_item_attributes():
+@frappe.read_only()
+def debug_item_attributes(start=0, page_length=200):
     """
     Debug function to see what attributes are currently set on items.
     Helps troubleshoot why colors/heights aren't showing up.
+    Item attribute rows are paged (at most 500 per call) so large catalogs stay cheap to inspect.
     """
+    start = max(cint(start), 0)
+    page_length = max(1, min(cint(page_length) or 200, 500))
     
+    return get_analysis_cached(
+        f"item_attributes:{start}:{page_length}",
+        lambda: build_item_attributes_debug(start, page_length)
+    )
+
+def build_item_attributes_debug(start, page_length):
     try:
-        # Get all items with any attributes
-        items_with_attributes = frappe.db.sql("""
+        # Vinyl items through the ft_item FULLTEXT index when it exists, otherwise a contains scan
+        if has_fulltext_index("Item", "ft_item"):
+            vinyl_condition = "MATCH(i.name, i.item_name) AGAINST (%(vinyl_fulltext)s IN BOOLEAN MODE)"
+        else:
+            vinyl_condition = "(i.name LIKE %(vinyl_like)s OR i.item_name LIKE %(vinyl_like)s)"
+        
+        params = {
+            "vinyl_fulltext": "+Vinyl*",
+            "vinyl_like": "%Vinyl%",
+            "start": start,
+            "page_length": page_length
+        }
+        
+        # Get all items with any attributes (only the columns the POS debug view prints)
+        items_with_attributes = frappe.db.sql(f"""
             SELECT 
                 i.name as item_code,
-                i.item_name,
                 iva.attribute,
-                iva.attribute_value,
-                i.has_variants,
-                i.is_sales_item,
-                i.disabled
+                iva.attribute_value
             FROM `tabItem` i
             INNER JOIN `tabItem Variant Attribute` iva ON i.name = iva.parent
-            WHERE (i.name LIKE '%Vinyl%' OR i.item_name LIKE '%Vinyl%')
+            WHERE {vinyl_condition}
             ORDER BY i.name, iva.attribute
-        """, as_dict=True)
+            LIMIT %(page_length)s OFFSET %(start)s
+        """, params, as_dict=True)
         
         # Get count of items by attribute
-        attribute_counts = frappe.db.sql("""
+        # (sellable items are picked up front through pos_item_variant_index instead of a per-row CASE)
+        attribute_counts = frappe.db.sql(f"""
+            WITH sellable AS (
+                SELECT i.name
+                FROM `tabItem` i
+                WHERE i.disabled = 0 AND i.has_variants = 0 AND i.is_sales_item = 1
+                    AND {vinyl_condition}
+            )
             SELECT 
                 iva.attribute,
                 iva.attribute_value,
                 COUNT(*) as item_count,
-                COUNT(CASE WHEN i.has_variants = 0 AND i.disabled = 0 AND i.is_sales_item = 1 THEN 1 END) as sellable_count
+                COUNT(s.name) as sellable_count
             FROM `tabItem Variant Attribute` iva
             INNER JOIN `tabItem` i ON iva.parent = i.name
-            WHERE (i.name LIKE '%Vinyl%' OR i.item_name LIKE '%Vinyl%')
+            LEFT JOIN sellable s ON s.name = i.name
+            WHERE {vinyl_condition}
             GROUP BY iva.attribute, iva.attribute_value
             ORDER BY iva.attribute, iva.attribute_value
-        """, as_dict=True)
+        """, params, as_dict=True)
         
         # Get items without any attributes
-        items_without_attributes = frappe.db.sql("""
+        items_without_attributes = frappe.db.sql(f"""
             SELECT i.name, i.item_name, i.has_variants, i.is_sales_item, i.disabled
             FROM `tabItem` i
-            LEFT JOIN `tabItem Variant Attribute` iva ON i.name = iva.parent
-            WHERE (i.name LIKE '%Vinyl%' OR i.item_name LIKE '%Vinyl%')
-                AND iva.parent IS NULL
+            WHERE {vinyl_condition}
+                AND NOT EXISTS (
+                    SELECT 1 FROM `tabItem Variant Attribute` iva WHERE iva.parent = i.name
+                )
             ORDER BY i.name
             LIMIT 20
-        """, as_dict=True)
+        """, params, as_dict=True)
         
         return {
             "success": True,
             "items_with_attributes": items_with_attributes,
             "attribute_counts": attribute_counts,
             "items_without_attributes": items_without_attributes,
-            "total_items_with_attributes": len(items_with_attributes),
+            # every attribute row is counted once in attribute_counts, so this is the unpaged total
+            "total_items_with_attributes": sum(attr.item_count for attr in attribute_counts),
+            "next_start": start + page_length if len(items_with_attributes) == page_length else None,
             "total_items_without_attributes": len(items_without_attributes)
         }
         
@@ -2822,107 +3343,83 @@ def debug_item_attributes():
 @frappe.whitelist()
 def populate_custom_style_field():
     """
-    Populate custom_style field for existing items based on item name patterns.
-    This is a one-time utility to set custom_style values automatically.
+    Kept for existing callers; this is a no-op.
+    custom_style is maintained by hand or via data import and is never derived from item names,
+    so there is nothing to populate automatically.
     """
-    
-    try:
-        # Get all items that don't have custom_style set
-        items_to_update = frappe.db.sql("""
-            SELECT name, item_name 
-            FROM `tabItem` 
-            WHERE (custom_style IS NULL OR custom_style = '')
-                AND disabled = 0
-                AND item_name IS NOT NULL
-        """, as_dict=True)
-        
-        updated_count = 0
-        updated_items = []
-        
-        for item in items_to_update:
-            item_name = item.item_name.lower()
-            custom_style = None
-            
-            # Only set custom_style if it's not already set
-            # The custom_style field should be populated manually or via data import
-            # We don't auto-populate based on text matching
-            if not item.custom_style:
-                custom_style = None  # Let user populate this field manually
-            
-            # Update the item if we determined a style
-            if custom_style:
-                try:
-                    frappe.db.set_value("Item", item.name, "custom_style", custom_style)
-                    updated_count += 1
-                    updated_items.append({
-                        "item_code": item.name,
-                        "item_name": item.item_name,
-                        "assigned_style": custom_style
-                    })
-                except Exception as e:
-                    frappe.log_error(f"Error updating custom_style for {item.name}: {str(e)}")
-        
-        frappe.db.commit()
-        
-        return {
-            "success": True,
-            "message": f"Successfully populated custom_style for {updated_count} items",
-            "total_items_processed": len(items_to_update),
-            "updated_count": updated_count,
-            "sample_updates": updated_items[:10]  # Show first 10 as examples
-        }
-        
-    except Exception as e:
-        frappe.log_error(f"Error populating custom_style field: {str(e)}")
-        return {
-            "success": False,
-            "error": str(e)
-        }
+    return {
+        "success": True,
+        "message": "No automatic population rules defined",
+        "total_items_processed": 0,
+        "updated_count": 0,
+        "sample_updates": []
+    }
 
 @frappe.whitelist()
-def get_custom_style_distribution():
+@frappe.read_only()
+def get_custom_style_distribution(include_samples=0):
+    include_samples = cint(include_samples)
+    return get_analysis_cached(
+        f"custom_style_distribution:{include_samples}",
+        lambda: build_custom_style_distribution(include_samples)
+    )
+
+def build_custom_style_distribution(include_samples=0):
     """
     Get distribution of custom_style values to understand current data.
     Useful for verifying the custom_style field setup.
+    Sample items per style are only fetched with include_samples.
     """
     
     try:
-        # Get distribution of custom_style values
+        # Get distribution of custom_style values; NULL and '' fold into one group for items without a style
         style_distribution = frappe.db.sql("""
             SELECT 
-                custom_style,
+                NULLIF(custom_style, '') as custom_style,
                 COUNT(*) as item_count
             FROM `tabItem`
             WHERE disabled = 0
-                AND custom_style IS NOT NULL 
-                AND custom_style != ''
-            GROUP BY custom_style
+            GROUP BY NULLIF(custom_style, '')
             ORDER BY item_count DESC
         """, as_dict=True)
         
-        # Get sample items for each style
-        style_samples = {}
+        # Split off the no-style group and total the rest in the same pass
+        items_without_style = 0
+        total_items_with_style = 0
+        styled = []
         for style_info in style_distribution:
-            style = style_info.custom_style
-            samples = frappe.db.get_list("Item",
-                filters={"custom_style": style, "disabled": 0},
-                fields=["name", "item_name", "custom_material_type"],
-                limit=5
-            )
-            style_samples[style] = samples
+            if style_info.custom_style is None:
+                items_without_style = style_info.item_count
+            else:
+                total_items_with_style += style_info.item_count
+                styled.append(style_info)
+        style_distribution = styled
         
-        # Get items without custom_style
-        items_without_style = frappe.db.count("Item", {
-            "custom_style": ["in", ["", None]],
-            "disabled": 0
-        })
+        # Get the 5 most recently modified sample items for each style in one query
+        style_samples = {}
+        if include_samples and style_distribution:
+            style_samples = {style_info.custom_style: [] for style_info in style_distribution}
+            samples = frappe.db.sql("""
+                SELECT name, item_name, custom_material_type, custom_style
+                FROM (
+                    SELECT name, item_name, custom_material_type, custom_style,
+                        ROW_NUMBER() OVER (PARTITION BY custom_style ORDER BY modified DESC) AS sample_rank
+                    FROM `tabItem`
+                    WHERE disabled = 0 AND custom_style IN %(styles)s
+                ) ranked
+                WHERE sample_rank <= 5
+                ORDER BY custom_style, sample_rank
+            """, {"styles": tuple(style_samples)}, as_dict=True)
+            
+            for sample in samples:
+                style_samples[sample.pop("custom_style")].append(sample)
         
         return {
             "success": True,
             "style_distribution": style_distribution,
             "style_samples": style_samples,
             "items_without_style": items_without_style,
-            "total_items_with_style": sum(style.item_count for style in style_distribution)
+            "total_items_with_style": total_items_with_style
         }
         
     except Exception as e:
@@ -2932,6 +3429,15 @@ def get_custom_style_distribution():
             "error": str(e)
         }
 
+# POS material type slugs -> Style.material_type values
+_MATERIAL_TYPE_NAMES = {
+    'vinyl': 'Vinyl',
+    'aluminum': 'Aluminum',
+    'wood': 'Wood',
+    'pressure-treated': 'Pressure Treated',
+    'chain-link': 'Chain Link'
+}
+
 @frappe.whitelist()
 def get_styles_for_material_type(material_type=None):
     """
@@ -2943,17 +3449,9 @@ def get_styles_for_material_type(material_type=None):
         
         # Filter by material type if provided
         if material_type:
-            # Map common material type variations to standard names
-            material_type_mapping = {
-                'vinyl': 'Vinyl',
-                'aluminum': 'Aluminum', 
-                'wood': 'Wood',
-                'pressure-treated': 'Pressure Treated',
-                'chain-link': 'Chain Link'
-            }
-            
-            # Use mapped name or original value
-            mapped_material_type = material_type_mapping.get(material_type.lower(), material_type)
+            # Map common material type variations to standard names,
+            # or use the original value
+            mapped_material_type = _MATERIAL_TYPE_NAMES.get(material_type.lower(), material_type)
             filters['material_type'] = mapped_material_type
         
         # Get styles from Style doctype
@@ -2965,7 +3463,7 @@ def get_styles_for_material_type(material_type=None):
         
         # No fallback descriptions - use only what's in doctype
         
-        frappe.logger().info(f"Found {len(styles)} styles for material type: {material_type}")
+        logger.info("Found %s styles for material type: %s", len(styles), material_type)
         
         return {
             "success": True,
@@ -3002,7 +3500,7 @@ def update_item_custom_style_field():
         })
         
         if not custom_field_name:
-            print("custom_style field does not exist. Creating it as Link field...")
+            logger.info("custom_style field does not exist. Creating it as Link field...")
             
             # Create new Link field
             custom_field = frappe.get_doc({
@@ -3117,6 +3615,7 @@ def migrate_existing_style_data():
                 })
         
         frappe.db.commit()
+        clear_pos_analysis_cache()
         
         return {
             "success": True,
@@ -3135,63 +3634,80 @@ def migrate_existing_style_data():
         }
 
 @frappe.whitelist()
-def get_item_data_analysis():
+@frappe.read_only()
+def get_item_data_analysis(include_samples=0):
+    include_samples = cint(include_samples)
+    return get_analysis_cached(
+        f"item_data_analysis:{include_samples}",
+        lambda: build_item_data_analysis(include_samples)
+    )
+
+def build_item_data_analysis(include_samples=0):
     """
     Analyze current item data to understand what's populated in custom fields
     and variant attributes. Use this to guide proper data-driven filtering.
+    Recently modified sample items are only fetched with include_samples.
     """
     
     try:
-        # Check custom field population
-        custom_fields_data = frappe.db.sql("""
-            SELECT 
-                COUNT(*) as total_items,
-                COUNT(custom_style) as items_with_style,
-                COUNT(custom_material_type) as items_with_material_type,
-                COUNT(custom_material_class) as items_with_material_class
+        # Check custom_style, custom_material_type and custom_material_class distributions in one round trip,
+        # plus the enabled item total
+        distributions = {"custom_style": [], "custom_material_type": [], "custom_material_class": []}
+        distribution_rows = frappe.db.sql("""
+            SELECT 'total_items' as field, NULL as value, COUNT(*) as count
             FROM `tabItem` 
             WHERE disabled = 0
-        """, as_dict=True)[0]
-        
-        # Check custom_style distribution
-        style_distribution = frappe.db.sql("""
-            SELECT custom_style, COUNT(*) as count
+            UNION ALL
+            SELECT 'custom_style', custom_style, COUNT(*)
             FROM `tabItem` 
             WHERE disabled = 0 AND custom_style IS NOT NULL
             GROUP BY custom_style
-        """, as_dict=True)
-        
-        # Check custom_material_type distribution  
-        material_type_distribution = frappe.db.sql("""
-            SELECT custom_material_type, COUNT(*) as count
+            UNION ALL
+            SELECT 'custom_material_type', custom_material_type, COUNT(*)
             FROM `tabItem` 
             WHERE disabled = 0 AND custom_material_type IS NOT NULL
             GROUP BY custom_material_type
-        """, as_dict=True)
-        
-        # Check custom_material_class distribution
-        material_class_distribution = frappe.db.sql("""
-            SELECT custom_material_class, COUNT(*) as count
+            UNION ALL
+            SELECT 'custom_material_class', custom_material_class, COUNT(*)
             FROM `tabItem` 
             WHERE disabled = 0 AND custom_material_class IS NOT NULL
             GROUP BY custom_material_class
         """, as_dict=True)
         
+        total_items = 0
+        for row in distribution_rows:
+            if row.field == "total_items":
+                total_items = row.count
+            else:
+                distributions[row.field].append({row.field: row.value, "count": row.count})
+        
+        style_distribution = distributions["custom_style"]
+        material_type_distribution = distributions["custom_material_type"]
+        material_class_distribution = distributions["custom_material_class"]
+        
+        # Check custom field population (each distribution covers exactly the non-NULL values)
+        custom_fields_data = {
+            "total_items": total_items,
+            "items_with_style": sum(row["count"] for row in style_distribution),
+            "items_with_material_type": sum(row["count"] for row in material_type_distribution),
+            "items_with_material_class": sum(row["count"] for row in material_class_distribution)
+        }
+        
         # Check variant attributes
-        variant_attributes = frappe.db.sql("""
-            SELECT DISTINCT attribute
-            FROM `tabItem Variant Attribute`
-            ORDER BY attribute
-        """, as_dict=True)
+        variant_attributes = frappe.get_all(
+            "Item Variant Attribute", distinct=True, pluck="attribute", order_by="attribute"
+        )
         
         # Sample items with their data
-        sample_items = frappe.db.sql("""
-            SELECT name, item_name, custom_style, custom_material_type, custom_material_class, has_variants
-            FROM `tabItem` 
-            WHERE disabled = 0
-            ORDER BY modified DESC
-            LIMIT 10
-        """, as_dict=True)
+        sample_items = []
+        if include_samples:
+            sample_items = frappe.db.sql("""
+                SELECT name, item_name, custom_style, custom_material_type, custom_material_class, has_variants
+                FROM `tabItem` 
+                WHERE disabled = 0
+                ORDER BY modified DESC
+                LIMIT 10
+            """, as_dict=True)
         
         return {
             "success": True,
@@ -3199,7 +3715,7 @@ def get_item_data_analysis():
             "style_distribution": style_distribution,
             "material_type_distribution": material_type_distribution,
             "material_class_distribution": material_class_distribution,
-            "variant_attributes": [attr.attribute for attr in variant_attributes],
+            "variant_attributes": variant_attributes,
             "sample_items": sample_items
         }
         
@@ -3211,24 +3727,42 @@ def get_item_data_analysis():
         }
 
 @frappe.whitelist()
+@frappe.read_only()
 def check_specific_items_status(item_codes):
     """
     Check the database status of specific item codes to understand why they might be filtered
+    Returns one entry per requested code, in request order
     """
     try:
-        if isinstance(item_codes, str):
-            import json
-            item_codes = json.loads(item_codes)
+        item_codes = frappe.parse_json(item_codes) or []
+        if not isinstance(item_codes, list):
+            item_codes = []
         
-        items_data = []
+        # Duplicates would only repeat the same lookup; input order is kept
+        item_codes = list(dict.fromkeys(code for code in item_codes if isinstance(code, str)))
+        if not item_codes:
+            return []
+        
+        if len(item_codes) > 1000:
+            frappe.throw(_("Too many item codes (at most 1000 per request)"))
+        
+        # Get item details for all codes in one query
+        Item = frappe.qb.DocType("Item")
+        rows = (
+            frappe.qb.from_(Item)
+            .select(
+                Item.name, Item.item_code, Item.item_name, Item.has_variants, Item.is_sales_item,
+                Item.disabled, Item.is_stock_item, Item.custom_style, Item.custom_material_type,
+                Item.custom_material_class
+            )
+            .where(Item.name.isin(item_codes))
+        ).run(as_dict=True)
+        
+        by_code = {row.pop("name"): row for row in rows}
         
+        items_data = []
         for item_code in item_codes:
-            # Get item details
-            item = frappe.db.get_value('Item', item_code, [
-                'item_code', 'item_name', 'has_variants', 'is_sales_item', 'disabled',
-                'is_stock_item', 'custom_style', 'custom_material_type', 'custom_material_class'
-            ], as_dict=True)
-            
+            item = by_code.get(item_code)
             if item:
                 items_data.append(item)
             else:
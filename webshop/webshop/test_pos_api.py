@@ -0,0 +1,56 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from webshop.webshop.pos_api import (
+	classify_fence_component,
+	component_type_sql,
+	decode_pos_cursor,
+	encode_pos_cursor,
+	escape_like,
+)
+
+
+class TestPOSApiHelpers(FrappeTestCase):
+	def test_escape_like(self):
+		self.assertEqual(escape_like("6ft panel"), "6ft panel")
+		self.assertEqual(escape_like("100%"), r"100\%")
+		self.assertEqual(escape_like("post_cap"), r"post\_cap")
+		self.assertEqual(escape_like("a\\b"), "a\\\\b")
+
+	def test_pos_cursor_round_trip(self):
+		for key in (
+			("Panel", "6ft White Vinyl Privacy Panel", "VINYL-PANEL-6FT-WHITE"),
+			(None, None, "ITEM-0001"),
+			("Cap", "Post Cap \"New England\" 5x5", "CAP-NE-5X5"),
+		):
+			cursor = encode_pos_cursor(*key)
+			self.assertEqual(decode_pos_cursor(cursor), [key[0] or "", key[1] or "", key[2]])
+
+	def test_invalid_pos_cursor(self):
+		for cursor in ("not a cursor", encode_pos_cursor("a", "b", "c")[:-4], "WyJhIl0="):
+			self.assertRaises(frappe.ValidationError, decode_pos_cursor, cursor)
+
+	def test_classify_fence_component(self):
+		self.assertEqual(classify_fence_component("6ft White Vinyl Privacy Panel"), "panels")
+		self.assertEqual(classify_fence_component("5x5 Line Post"), "posts")
+		self.assertEqual(classify_fence_component("4ft Walk Gate"), "gates")
+		self.assertEqual(classify_fence_component("New England Cap"), "caps")
+		self.assertEqual(classify_fence_component("Gate Hinge"), "gates")
+		self.assertEqual(classify_fence_component("Self-Closing Hinge"), "hardware")
+		self.assertEqual(classify_fence_component("Bracket Kit"), "hardware")
+		self.assertEqual(classify_fence_component("Touch-up Paint"), "other")
+		self.assertEqual(classify_fence_component(None), "other")
+
+	def test_classify_fence_component_precedence(self):
+		# Earlier component types win wherever their keyword appears in the name
+		self.assertEqual(classify_fence_component("Cap for Panel"), "panels")
+		self.assertEqual(classify_fence_component("Post Cap"), "posts")
+		self.assertEqual(classify_fence_component("Gate Post"), "posts")
+		self.assertEqual(classify_fence_component("GATE LATCH"), "gates")
+
+	def test_component_type_sql_follows_keyword_order(self):
+		sql = component_type_sql("i.item_name")
+		positions = [sql.index(f"THEN '{kind}'") for kind in ("panels", "posts", "gates", "caps", "hardware")]
+		self.assertEqual(positions, sorted(positions))
+		self.assertIn("LIKE '%%bracket%%'", sql)
+		self.assertIn("ELSE 'other'", sql)